@@ -1,6 +1,10 @@
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+import os
 from pathlib import Path
 import traceback
 import uuid
+from dotenv import load_dotenv
 from fastapi import (
     FastAPI,
     UploadFile,
@@ -9,41 +13,189 @@ from fastapi import (
     File,
     Body,
 )
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.datastructures import Headers
 from web.models import ExtractorConfig, JobResponse, JobStatus
-from web.job_store import JobStore
-from core.service import extract_from_config
+from web.job_store import get_job_store
+from core.cache_manager import CacheManager
+from core.metrics import (
+    ACTIVE_JOBS,
+    CACHE_HIT_RATIO,
+    CACHE_HITS,
+    CACHE_MISSES,
+    JOBS,
+    REGISTRY,
+    STAGE_DURATION,
+)
+from core.exceptions import ValidationError
+from core.service import aextract_from_config
+from core.tracing import span
+from core.utils import new_hasher
+from data_extractor.llm_extractor import (
+    LLM_CACHE_DIR,
+    LLM_CACHE_SIZE_LIMIT_MB,
+    LLM_CACHE_TTL_SECONDS,
+)
+
+load_dotenv()
+API_OCR_WORKERS = int(os.getenv("API_OCR_WORKERS", 2))
+API_LLM_WORKERS = int(os.getenv("API_LLM_WORKERS", 5))
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE_MB", 100)) * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+job_store = get_job_store()
+job_store.max_active_jobs = API_LLM_WORKERS
+
+text_executor: ProcessPoolExecutor | None = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global text_executor
+    text_executor = ProcessPoolExecutor(max_workers=API_OCR_WORKERS)
+    try:
+        yield
+    finally:
+        text_executor.shutdown(wait=False, cancel_futures=True)
 
-app = FastAPI()
 
-job_store = JobStore()
+app = FastAPI(lifespan=lifespan)
 
 UPLOAD_DIR = Path(__file__).parent / "uploads"
 UPLOAD_DIR.mkdir(exist_ok=True)
 
 
-def save_upload_file(upload_file: UploadFile) -> Path:
+def _upload_too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File exceeds the maximum upload size of {UPLOAD_MAX_SIZE // 1024 // 1024} MB.",
+    )
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject uploads larger than UPLOAD_MAX_SIZE before they are parsed, from
+    the Content-Length header when sent, otherwise as soon as the streamed
+    body (e.g. chunked encoding) exceeds it
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] != "/extract":
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if (
+            content_length is not None
+            and content_length.isdigit()
+            and int(content_length) > UPLOAD_MAX_SIZE
+        ):
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > UPLOAD_MAX_SIZE:
+                    raise _upload_too_large()
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except HTTPException as e:
+            # Raised outside of request parsing, FastAPI did not answer it
+            if e.status_code != 413 or response_started:
+                raise
+            await self._reject(scope, receive, send)
+
+    @staticmethod
+    async def _reject(scope, receive, send):
+        error = _upload_too_large()
+        response = JSONResponse(
+            status_code=error.status_code, content={"detail": error.detail}
+        )
+        await response(scope, receive, send)
+
+
+app.add_middleware(UploadSizeLimitMiddleware)
+
+
+async def save_upload_file(upload_file: UploadFile) -> tuple[Path, str]:
+    if upload_file.size is not None and upload_file.size > UPLOAD_MAX_SIZE:
+        raise _upload_too_large()
+
     file_path = UPLOAD_DIR / f"{uuid.uuid4()}_{upload_file.filename}"
-    with open(file_path, "wb") as f:
-        f.write(upload_file.file.read())
-    return file_path
+    digest = new_hasher()
+    size = 0
+    try:
+        with open(file_path, "wb") as f:
+            while chunk := await upload_file.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > UPLOAD_MAX_SIZE:
+                    raise _upload_too_large()
+                digest.update(chunk)
+                await run_in_threadpool(f.write, chunk)
+    except BaseException:
+        file_path.unlink(missing_ok=True)
+        raise
+    return file_path, digest.hexdigest()
 
 
-async def process_file(job_id: str, file_path: Path, config: ExtractorConfig):
+def update_job(job_id: str, status: JobStatus, **kwargs):
+    job_store.update_job(job_id, status, **kwargs)
+    JOBS.inc(status=status.value)
+
+
+async def process_file(
+    job_id: str, file_path: Path, content_hash: str, config: ExtractorConfig
+):
+    # Uploads are stored as <uuid>_<original name>
+    attributes = {"job.id": job_id, "file.name": file_path.name.partition("_")[2]}
     try:
-        job_store.update_job(job_id, JobStatus.PROCESSING)
+        # Job store writes are SQLite transactions, kept off the event loop
+        await run_in_threadpool(update_job, job_id, JobStatus.PROCESSING)
 
-        result = extract_from_config(
-            file_path=file_path,
-            config=config,
-        )
+        with span("job", attributes) as job:
+            result = await aextract_from_config(
+                file_path=file_path,
+                config=config,
+                text_executor=text_executor,
+                content_hash=content_hash,
+            )
+            if isinstance(result, ValidationError):
+                job.record_error(result.reason)
 
+        page_sources = getattr(result, "page_sources", None)
         if hasattr(result, "model_dump"):
             result = result.model_dump()
 
-        job_store.update_job(job_id, JobStatus.COMPLETED, result=result)
+        await run_in_threadpool(
+            update_job,
+            job_id,
+            JobStatus.COMPLETED,
+            result=result,
+            page_sources=page_sources,
+        )
     except Exception as e:
         error_details = f"Error: {str(e)}\nTraceback:\n{traceback.format_exc()}"
-        job_store.update_job(job_id, JobStatus.FAILED, error=error_details)
+        await run_in_threadpool(
+            update_job, job_id, JobStatus.FAILED, error=error_details
+        )
     finally:
         file_path.unlink(missing_ok=True)
 
@@ -54,7 +206,7 @@ async def extract_file(
     config: str = Body(...),
     file: UploadFile = File(...),
 ) -> JobResponse:
-    if not job_store.can_accept_job():
+    if not await run_in_threadpool(job_store.can_accept_job):
         raise HTTPException(
             status_code=429,
             detail=f"Maximum number of concurrent jobs ({job_store.max_active_jobs}) reached. Please try again later.",
@@ -64,26 +216,56 @@ async def extract_file(
         config = ExtractorConfig.model_validate_json(config)
 
     try:
-        job_id = job_store.create_job()
-        file_path = save_upload_file(file)
+        with STAGE_DURATION.time(stage="upload_save"):
+            file_path, content_hash = await save_upload_file(file)
+        job_id = await run_in_threadpool(job_store.create_job)
+        JOBS.inc(status=JobStatus.PENDING.value)
 
-        background_tasks.add_task(process_file, job_id, file_path, config)
+        background_tasks.add_task(process_file, job_id, file_path, content_hash, config)
 
-        return job_store.get_job(job_id)
+        return await run_in_threadpool(job_store.get_job, job_id)
+    except HTTPException:
+        raise
     except Exception as e:
         error_details = (
             f"File processing error: {str(e)}\nTraceback:\n{traceback.format_exc()}"
         )
         if "job_id" in locals():
-            job_store.update_job(job_id, JobStatus.FAILED, error=error_details)
+            await run_in_threadpool(
+                update_job, job_id, JobStatus.FAILED, error=error_details
+            )
         raise HTTPException(status_code=500, detail=error_details)
 
 
 @app.get("/status/{job_id}")
 async def get_status(job_id: str) -> JobResponse:
-    job = job_store.get_job(job_id)
+    job = await run_in_threadpool(job_store.get_job, job_id)
     if job is None:
         return JobResponse(
             job_id=job_id, status=JobStatus.FAILED, error="Job not found"
         )
     return job
+
+
+# Not async: FastAPI runs it in the threadpool, off the event loop, since it
+# queries the job store and the caches
+@app.get("/metrics")
+def get_metrics() -> PlainTextResponse:
+    ACTIVE_JOBS.set(job_store.count_active_jobs())
+    caches = {
+        "ocr": CacheManager(),
+        "llm": CacheManager(
+            LLM_CACHE_DIR,
+            size_limit_mb=LLM_CACHE_SIZE_LIMIT_MB,
+            ttl_seconds=LLM_CACHE_TTL_SECONDS,
+        ),
+    }
+    for name, cache in caches.items():
+        stats = cache.stats()
+        CACHE_HITS.set(stats["hits"], cache=name)
+        CACHE_MISSES.set(stats["misses"], cache=name)
+        CACHE_HIT_RATIO.set(stats["hit_ratio"], cache=name)
+
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,174 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import json
+import multiprocessing
+import os
+from pathlib import Path
+import platform
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+from bench.report import compare, display_comparison, display_result
+from bench.scenarios import SCENARIOS, run_scenario
+from cli.ui import CONSOLE
+from core.utils import JSON_IDENTATION, load_json_file, write_file
+
+ROOT_DIR = Path(__file__).parent.parent
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def parse_args(args: List[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench",
+        description="Benchmark Extrix with offline stand-ins for OCR and the LLM",
+    )
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(SCENARIOS),
+        default=list(SCENARIOS),
+        help="Scenarios to run (default: all)",
+    )
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument(
+        "--data-dir",
+        default=str(ROOT_DIR / "data"),
+        help="Directory of the fixture PDF documents, cycled through (default: data/)",
+    )
+    parser.add_argument(
+        "--schema",
+        default=str(ROOT_DIR / "config" / "model.json"),
+        help="Model schema the fake LLM answers (default: config/model.json)",
+    )
+    parser.add_argument(
+        "--examples",
+        default=str(ROOT_DIR / "data" / "examples.json"),
+        help="Examples whose valid answers the fake LLM returns, sample values are used without any (default: data/examples.json)",
+    )
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument(
+        "--llm-latency",
+        type=float,
+        default=0.5,
+        help="Mean latency of a fake LLM call in seconds (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--llm-jitter",
+        type=float,
+        default=0.2,
+        help="Maximum deviation from the mean LLM latency in seconds (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--ocr-latency",
+        type=float,
+        default=0.05,
+        help="Simulated OCR time per page in seconds (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--no-structured-output",
+        action="store_true",
+        help="Make the fake LLM refuse tool calling, to measure the JSON parsing fallback",
+    )
+    parser.add_argument(
+        "--llm-cache", action="store_true", help="Keep the LLM response cache enabled"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--poll-seconds", type=float, default=0.05)
+    parser.add_argument(
+        "--output",
+        help="Results file (default: bench/results/<date>-<commit>.json)",
+    )
+    parser.add_argument(
+        "--compare",
+        help="Results file of a previous run to compare with",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative change counted as a regression (default: %(default)s)",
+    )
+    return parser.parse_args(args)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _options(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "documents": args.documents,
+        "data_dir": args.data_dir,
+        "schema": args.schema,
+        "examples": args.examples,
+        "workers": args.workers,
+        "concurrency": args.concurrency,
+        "llm_latency": args.llm_latency,
+        "llm_jitter": args.llm_jitter,
+        "ocr_latency": args.ocr_latency,
+        "structured_output": not args.no_structured_output,
+        "llm_cache": args.llm_cache,
+        "seed": args.seed,
+        "poll_seconds": args.poll_seconds,
+    }
+
+
+def main(args: List[str]) -> int:
+    args = parse_args(args)
+    options = _options(args)
+    commit = _git_commit()
+    results: Dict[str, Any] = {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "options": options,
+        "scenarios": {},
+    }
+
+    for name in args.scenarios:
+        CONSOLE.print(f"[dim]Running {name}...[/dim]")
+        # A fresh process per scenario keeps peak RSS and caches separate
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=multiprocessing.get_context("spawn")
+        ) as executor:
+            result = executor.submit(run_scenario, name, options).result()
+        results["scenarios"][name] = result
+        display_result(name, result)
+
+    output = Path(
+        args.output
+        or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'unknown'}.json"
+    )
+    write_file(output, json.dumps(results, indent=JSON_IDENTATION))
+    CONSOLE.print(f"Results saved to: [blue]{output}[/blue]")
+
+    if args.compare:
+        baseline = load_json_file(Path(args.compare))
+        if baseline["options"] != options:
+            CONSOLE.print(
+                "[yellow]The baseline was run with other options, "
+                "differences are not only due to the code[/yellow]"
+            )
+        rows = compare(baseline, results, args.threshold)
+        display_comparison(rows, args.compare)
+        if any(row["regression"] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,145 @@
+import asyncio
+from datetime import date, datetime
+import hashlib
+import json
+from pathlib import Path
+from time import sleep
+from types import NoneType, UnionType
+from typing import Any, Dict, List, Union, get_args, get_origin
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel
+
+from core.utils import extract_pdf_text_layer
+from text_extractor.text_extractor import TextExtractor
+
+
+def sample_value(annotation: Any) -> Any:
+    if get_origin(annotation) in (Union, UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not NoneType]
+        return sample_value(args[0]) if args else None
+    if get_origin(annotation) in (list, List):
+        args = get_args(annotation)
+        return [sample_value(args[0])] if args else []
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return sample_record(annotation)
+    # bool is checked before int since it is a subclass of int
+    for python_type, value in [
+        (bool, True),
+        (int, 1),
+        (float, 1.5),
+        (datetime, "2024-01-01T00:00:00"),
+        (date, "2024-01-01"),
+    ]:
+        if isinstance(annotation, type) and issubclass(annotation, python_type):
+            return value
+    return "bench"
+
+
+def sample_record(model: type[BaseModel]) -> Dict[str, Any]:
+    """
+    Deterministic record filling every field of a model
+
+    Returns:
+        Field values of the expected types, cross-field validators aside
+    """
+    return {
+        name: sample_value(field.annotation)
+        for name, field in model.model_fields.items()
+    }
+
+
+def _approximate_tokens(text: str) -> int:
+    return max(len(text) // 4, 1)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Offline chat model answering each prompt with one of `records` after a
+    simulated latency. The record and latency of a prompt are derived from
+    its content and the seed, so a run is reproducible whatever the order of
+    the calls.
+    Tool calling is supported unless `structured_output` is False, in which
+    case the extractor falls back to parsing a JSON answer.
+    """
+
+    records: List[Dict[str, Any]]
+    latency: float = 0.5
+    jitter: float = 0.2
+    seed: int = 0
+    structured_output: bool = True
+    tool_name: str | None = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "bench-fake"
+
+    def _draw(self, messages: List[BaseMessage]) -> tuple[float, int]:
+        content = "".join(str(message.content) for message in messages)
+        digest = hashlib.sha256(f"{self.seed}:{content}".encode()).digest()
+        spread = int.from_bytes(digest[:8], "big") / 2**64
+        latency = max(self.latency + self.jitter * (2 * spread - 1), 0.0)
+        return latency, int.from_bytes(digest[8:16], "big") % len(self.records)
+
+    def _result(self, messages: List[BaseMessage], index: int) -> ChatResult:
+        record = self.records[index]
+        answer = json.dumps(record, ensure_ascii=False)
+        usage = {
+            "input_tokens": sum(
+                _approximate_tokens(str(message.content)) for message in messages
+            ),
+            "output_tokens": _approximate_tokens(answer),
+        }
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+
+        if self.tool_name is not None:
+            message = AIMessage(
+                content="",
+                tool_calls=[{"name": self.tool_name, "args": record, "id": "0"}],
+                usage_metadata=usage,
+            )
+        else:
+            message = AIMessage(content=f"```json\n{answer}\n```", usage_metadata=usage)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        latency, index = self._draw(messages)
+        sleep(latency)
+        return self._result(messages, index)
+
+    async def _agenerate(
+        self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs
+    ) -> ChatResult:
+        latency, index = self._draw(messages)
+        await asyncio.sleep(latency)
+        return self._result(messages, index)
+
+    def bind_tools(self, tools, **kwargs) -> "FakeChatModel":
+        if not self.structured_output:
+            raise NotImplementedError("Structured output disabled for the benchmark")
+        name = convert_to_openai_tool(tools[0])["function"]["name"]
+        return self.model_copy(update={"tool_name": name})
+
+
+class FixtureTextExtractor(TextExtractor):
+    """
+    Stand-in for OCR reading the text layer of the fixture documents, then
+    waiting `seconds_per_page` per page to simulate the cost of OCR.
+    """
+
+    name = "fixture"
+    seconds_per_page = 0.05
+
+    def get_text_content(self, file_path: str, content_hash: str | None = None) -> str:
+        path = Path(file_path)
+        if path.suffix.lower() == ".pdf":
+            pages = extract_pdf_text_layer(path)
+        else:
+            pages = [path.read_text()]
+        sleep(self.seconds_per_page * len(pages))
+        return "\n".join(pages)
@@ -0,0 +1,133 @@
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from cli.ui import CONSOLE
+
+# Metric path in a scenario result, and whether a higher value is better
+COMPARED_METRICS = [
+    (("docs_per_second",), True),
+    (("latency_seconds", "p50"), False),
+    (("latency_seconds", "p95"), False),
+    (("latency_seconds", "p99"), False),
+    (("peak_rss_mb", "main"), False),
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    # Linear interpolation between the closest ranks
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    return {
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": max(values),
+    }
+
+
+def stage_breakdown(spans: List[dict]) -> Dict[str, Dict[str, float]]:
+    """
+    Time spent per span name. Spans nest and run concurrently, so totals
+    add up to more than the wall time of the run.
+
+    Returns:
+        Count, total and mean seconds per stage
+    """
+    durations: Dict[str, List[float]] = defaultdict(list)
+    for span in spans:
+        durations[span["name"]].append(
+            (span["end_time_unix_nano"] - span["start_time_unix_nano"]) / 1e9
+        )
+    return {
+        name: {
+            "count": len(values),
+            "total_seconds": sum(values),
+            "mean_seconds": sum(values) / len(values),
+        }
+        for name, values in sorted(durations.items())
+    }
+
+
+def _metric(result: Dict[str, Any], path: tuple[str, ...]) -> float | None:
+    for key in path:
+        if not isinstance(result, dict) or key not in result:
+            return None
+        result = result[key]
+    return result
+
+
+def compare(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> List[Dict[str, Any]]:
+    """
+    Compare the scenarios run in both results
+
+    Returns:
+        One row per scenario and metric, flagged as a regression when it got
+        worse by more than `threshold` (a fraction of the baseline)
+    """
+    rows = []
+    for scenario, result in current["scenarios"].items():
+        if scenario not in baseline["scenarios"]:
+            continue
+        for path, higher_is_better in COMPARED_METRICS:
+            before = _metric(baseline["scenarios"][scenario], path)
+            after = _metric(result, path)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            worse = -change if higher_is_better else change
+            rows.append(
+                {
+                    "scenario": scenario,
+                    "metric": ".".join(path),
+                    "baseline": before,
+                    "current": after,
+                    "change": change,
+                    "regression": worse > threshold,
+                }
+            )
+    return rows
+
+
+def display_result(name: str, result: Dict[str, Any]) -> None:
+    latency = result["latency_seconds"]
+    CONSOLE.print(f"[bold green]{name}[/bold green]")
+    CONSOLE.print(
+        f"{result['documents']} documents ({result['errors']} errors) in "
+        f"{result['wall_seconds']:.2f}s / [blue]{result['docs_per_second']:.2f} docs/s[/blue]"
+    )
+    if latency:
+        CONSOLE.print(
+            f"Latency p50 {latency['p50']:.3f}s / p95 {latency['p95']:.3f}s / "
+            f"p99 {latency['p99']:.3f}s / max {latency['max']:.3f}s"
+        )
+    CONSOLE.print(
+        f"Peak RSS: {result['peak_rss_mb']['main']:.0f} MB "
+        f"(worker processes {result['peak_rss_mb']['children']:.0f} MB)"
+    )
+    for stage, stats in result["stages"].items():
+        CONSOLE.print(
+            f"[dim]  {stage}: {stats['count']} x {stats['mean_seconds'] * 1000:.1f} ms "
+            f"= {stats['total_seconds']:.2f}s[/dim]"
+        )
+
+
+def display_comparison(rows: List[Dict[str, Any]], baseline: str) -> None:
+    CONSOLE.print(f"\n[bold green]Comparison with {baseline}[/bold green]")
+    for row in rows:
+        color = "red" if row["regression"] else "dim"
+        CONSOLE.print(
+            f"[{color}]{row['scenario']} {row['metric']}: {row['baseline']:.3f} -> "
+            f"{row['current']:.3f} ({row['change'] * 100:+.1f}%)"
+            f"{' REGRESSION' if row['regression'] else ''}[/{color}]"
+        )
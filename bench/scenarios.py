@@ -0,0 +1,265 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import cycle, islice
+import multiprocessing
+import os
+from pathlib import Path
+import resource
+import socket
+import tempfile
+from threading import Thread
+from time import perf_counter, sleep
+from typing import Any, Callable, Dict, Iterator, List
+from unittest import mock
+
+from bench.report import percentiles, stage_breakdown
+
+BENCH_PROVIDER = "bench"
+BENCH_MODEL = "fake"
+
+
+def fixture_files(data_dir: Path, documents: int) -> List[Path]:
+    files = sorted(path for path in data_dir.glob("*.pdf"))
+    if not files:
+        raise ValueError(f"No fixture documents found in {data_dir}")
+    return list(islice(cycle(files), documents))
+
+
+def _isolate(work_dir: Path, options: Dict[str, Any]) -> None:
+    # State files of the run go to its own directory, before any import
+    # of the modules reading them
+    for name, path in [
+        ("CACHE_DIR", "cache"),
+        ("LLM_CACHE_DIR", "llm_cache"),
+        ("CAPABILITY_REGISTRY_PATH", "capabilities.json"),
+        ("JOB_STORE_PATH", "jobs.db"),
+        ("MONITORING_FILE_PATH", "monitoring.json"),
+        ("MONITORING_EVENTS_PATH", "monitoring.jsonl"),
+        ("RATE_LIMIT_PATH", "rate_limits.db"),
+        ("TRACE_PATH", "traces.jsonl"),
+    ]:
+        os.environ[name] = str(work_dir / path)
+    os.environ.setdefault("QUEUE_MAX_ITEMS", "0")
+    os.environ["API_OCR_WORKERS"] = str(options["workers"])
+    os.environ["API_LLM_WORKERS"] = str(options["concurrency"])
+    os.environ["TRACE_EXPORTER"] = "file"
+
+
+def _valid_records(output_schema, examples_path: str | None) -> List[Dict[str, Any]]:
+    # Example answers are realistic and satisfy cross-field validators,
+    # which generated sample values cannot
+    from pydantic import ValidationError
+
+    from core.utils import load_json_file
+
+    if not examples_path or not Path(examples_path).exists():
+        return []
+    records = []
+    for example in load_json_file(Path(examples_path))["examples"]:
+        try:
+            output_schema.model_validate(example["content"])
+        except ValidationError:
+            continue
+        records.append(example["content"])
+    return records
+
+
+@contextmanager
+def _offline_models(options: Dict[str, Any]) -> Iterator[None]:
+    import data_extractor.chat_model_pool as chat_model_pool
+    from bench.fakes import FakeChatModel, FixtureTextExtractor, sample_record
+    from core.model_factory import ModelFactory
+    from core.service import TEXT_EXTRACTORS
+
+    output_schema = ModelFactory.load_model_json_file(Path(options["schema"]))
+    records = _valid_records(output_schema, options["examples"]) or [
+        sample_record(output_schema)
+    ]
+
+    def init_chat_model(**kwargs) -> FakeChatModel:
+        return FakeChatModel(
+            records=records,
+            latency=options["llm_latency"],
+            jitter=options["llm_jitter"],
+            seed=options["seed"],
+            structured_output=options["structured_output"],
+        )
+
+    FixtureTextExtractor.seconds_per_page = options["ocr_latency"]
+    with mock.patch.dict(TEXT_EXTRACTORS, {"fixture": FixtureTextExtractor}):
+        with mock.patch.object(chat_model_pool, "init_chat_model", init_chat_model):
+            yield
+
+
+def _extractor_config(options: Dict[str, Any]):
+    from core.utils import load_json_file
+    from web.models import ExtractorConfig
+
+    return ExtractorConfig(
+        strategy="fast",
+        no_cache=True,
+        text_extractor="fixture",
+        llm_model=BENCH_MODEL,
+        llm_provider=BENCH_PROVIDER,
+        no_llm_cache=not options["llm_cache"],
+        output_schema=load_json_file(Path(options["schema"])),
+    )
+
+
+def bench_extract_list(
+    files: List[Path], work_dir: Path, options: Dict[str, Any]
+) -> tuple[List[float], int]:
+    from core.model_factory import ModelFactory
+    from core.service import extract_list
+    from core.tracing import load_spans
+    from text_extractor.text_extractor import Strategy
+
+    _, errors = extract_list(
+        files,
+        ["fr"],
+        Strategy.FAST,
+        True,
+        "fixture",
+        ModelFactory.load_model_json_file(Path(options["schema"])),
+        output=str(work_dir / "output.jsonl"),
+        workers=options["workers"],
+        concurrency=options["concurrency"],
+        llm_model=BENCH_MODEL,
+        llm_provider=BENCH_PROVIDER,
+        no_llm_cache=not options["llm_cache"],
+    )
+    # A document spans from the start of its OCR to the end of its LLM call
+    latencies = [
+        (span["end_time_unix_nano"] - span["start_time_unix_nano"]) / 1e9
+        for span in load_spans()
+        if span["name"] == "document"
+    ]
+    return latencies, len(errors)
+
+
+def bench_extract_from_config(
+    files: List[Path], work_dir: Path, options: Dict[str, Any]
+) -> tuple[List[float], int]:
+    from core.exceptions import ValidationError
+    from core.service import extract_from_config
+
+    config = _extractor_config(options)
+
+    def run(file_path: Path) -> tuple[float, bool]:
+        start = perf_counter()
+        result = extract_from_config(file_path=file_path, config=config)
+        return perf_counter() - start, not isinstance(result, ValidationError)
+
+    with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+        outcomes = list(executor.map(run, files))
+    return [latency for latency, _ in outcomes], sum(not ok for _, ok in outcomes)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def bench_api(
+    files: List[Path], work_dir: Path, options: Dict[str, Any]
+) -> tuple[List[float], int]:
+    import httpx
+    import uvicorn
+
+    import api
+
+    server = uvicorn.Server(
+        uvicorn.Config(api.app, host="127.0.0.1", port=_free_port(), log_level="error")
+    )
+    thread = Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        sleep(0.01)
+
+    config = _extractor_config(options).model_dump_json()
+    base_url = f"http://127.0.0.1:{server.config.port}"
+
+    # Latency is measured as seen by a client: upload until the job is done
+    def run(client: httpx.Client, file_path: Path) -> tuple[float, bool]:
+        start = perf_counter()
+        while True:
+            with open(file_path, "rb") as f:
+                response = client.post(
+                    "/extract",
+                    data={"config": config},
+                    files={"file": (file_path.name, f, "application/pdf")},
+                )
+            # Too many active jobs, the client retries like a real one would
+            if response.status_code != 429:
+                break
+            sleep(options["poll_seconds"])
+        response.raise_for_status()
+        job_id = response.json()["job_id"]
+
+        while True:
+            job = client.get(f"/status/{job_id}").json()
+            if job["status"] in ("completed", "failed"):
+                ok = job["status"] == "completed" and isinstance(job["result"], dict)
+                return perf_counter() - start, ok
+            sleep(options["poll_seconds"])
+
+    try:
+        with httpx.Client(base_url=base_url, timeout=None) as client:
+            with ThreadPoolExecutor(max_workers=options["concurrency"]) as executor:
+                outcomes = list(executor.map(lambda f: run(client, f), files))
+    finally:
+        server.should_exit = True
+        thread.join()
+    return [latency for latency, _ in outcomes], sum(not ok for _, ok in outcomes)
+
+
+SCENARIOS: Dict[str, Callable[..., tuple[List[float], int]]] = {
+    "extract_list": bench_extract_list,
+    "extract_from_config": bench_extract_from_config,
+    "api": bench_api,
+}
+
+
+def _peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is in kilobytes on Linux; children only counts reaped processes
+    return {
+        "main": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def run_scenario(name: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run one scenario in the current process, meant to be a fresh one so that
+    peak memory and module state belong to this scenario only
+
+    Returns:
+        Throughput, latency percentiles, peak RSS and time spent per stage
+    """
+    # Worker pools inherit the offline stand-ins only when forked
+    multiprocessing.set_start_method("fork", force=True)
+
+    with tempfile.TemporaryDirectory(prefix="extrix-bench-") as tmp_dir:
+        work_dir = Path(tmp_dir)
+        _isolate(work_dir, options)
+        files = fixture_files(Path(options["data_dir"]), options["documents"])
+
+        from core.tracing import load_spans
+
+        with _offline_models(options):
+            start = perf_counter()
+            latencies, errors = SCENARIOS[name](files, work_dir, options)
+            wall_seconds = perf_counter() - start
+
+        spans = load_spans()
+
+    return {
+        "documents": len(files),
+        "errors": errors,
+        "wall_seconds": wall_seconds,
+        "docs_per_second": len(files) / wall_seconds,
+        "latency_seconds": percentiles(latencies),
+        "peak_rss_mb": _peak_rss_mb(),
+        "stages": stage_breakdown(spans),
+    }
@@ -1,3 +1,6 @@
+from pathlib import Path
+from contextlib import nullcontext
+
 from rich.progress import (
     Progress,
     SpinnerColumn,
@@ -8,7 +11,21 @@ from rich.progress import (
 
 from core.service import extract_from_config_file
 
-from cli.ui import CONSOLE as console, display_summary, print_banner
+from cli.ui import (
+    CONSOLE as console,
+    display_cache_stats,
+    display_client_pool_stats,
+    display_summary,
+    print_banner,
+)
+from core.cache_manager import CacheManager
+from data_extractor.chat_model_pool import ChatModelPool
+from data_extractor.llm_extractor import (
+    LLM_CACHE_DIR,
+    LLM_CACHE_SIZE_LIMIT_MB,
+    LLM_CACHE_TTL_SECONDS,
+)
+from core.tracing import configure_tracing, load_spans, span, write_timeline
 from core.utils import find_files
 from core.exceptions import OSNotSupportedError
 
@@ -35,13 +52,34 @@ def execute_extraction(args) -> None:
 
             args_dict = vars(args)
             args_dict.pop("files_path")
+            trace = args_dict.pop("trace")
+            if trace:
+                configure_tracing("file")
 
-            results = extract_from_config_file(
-                **args_dict,
-                files_path=files,
-                progress=progress,
-            )
+            with (
+                span("batch", {"files": len(files)}) if trace else nullcontext()
+            ) as batch:
+                results = extract_from_config_file(
+                    **args_dict,
+                    files_path=files,
+                    progress=progress,
+                )
+            if trace:
+                write_timeline(load_spans(trace_ids={batch.trace_id}), Path(trace))
+                console.print(
+                    f"[bold green]Trace timeline written to[/bold green] {trace}"
+                )
             display_summary(*results, args.output)
+            if not args.no_cache:
+                display_cache_stats(CacheManager().stats(), "OCR Cache Statistics")
+            if not args.no_llm_cache:
+                llm_cache = CacheManager(
+                    LLM_CACHE_DIR,
+                    size_limit_mb=LLM_CACHE_SIZE_LIMIT_MB,
+                    ttl_seconds=LLM_CACHE_TTL_SECONDS,
+                )
+                display_cache_stats(llm_cache.stats(), "LLM Cache Statistics")
+            display_client_pool_stats(ChatModelPool().stats())
 
     except OSNotSupportedError as e:
         console.print(f"[bold red]OS Compatibility Error:[/bold red] {str(e)}")
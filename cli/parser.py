@@ -1,6 +1,8 @@
 import argparse
 from typing import List
 
+from core.utils import resolve_chunk_overlap
+
 
 class RichHelpFormatter(argparse.HelpFormatter):
     def __init__(self, prog):
@@ -39,6 +41,11 @@ def parse_args(args: List[str]) -> argparse.Namespace:
     input_group.add_argument(
         "--no-cache", action="store_true", help="Disable cache for OCR results"
     )
+    input_group.add_argument(
+        "--no-text-layer",
+        action="store_true",
+        help="OCR every PDF page instead of reading the embedded text layer when present",
+    )
     input_group.add_argument(
         "--text-extractor",
         choices=["unstructured"],
@@ -68,6 +75,46 @@ def parse_args(args: List[str]) -> argparse.Namespace:
         help="LLM temperature setting - lower values are more focused (default: %(default)s)",
     )
 
+    llm_group.add_argument(
+        "--no-llm-cache",
+        action="store_true",
+        help="Disable cache for LLM responses",
+    )
+    llm_group.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Split documents longer than this many tokens into chunks extracted separately then merged (default: disabled)",
+    )
+    llm_group.add_argument(
+        "--chunk-overlap",
+        type=int,
+        help="Number of tokens shared by consecutive chunks, smaller than the chunk size (default: 200, at most a quarter of the chunk size)",
+    )
+    llm_group.add_argument(
+        "--chunk-concurrency",
+        type=int,
+        default=4,
+        help="Maximum number of chunks of a document extracted concurrently (default: %(default)s)",
+    )
+
+    llm_group.add_argument(
+        "--prune-context",
+        action="store_true",
+        help="Only send the passages most relevant to the schema fields to the LLM",
+    )
+    llm_group.add_argument(
+        "--prune-top-k",
+        type=int,
+        default=3,
+        help="Number of passages kept per schema field when pruning (default: %(default)s)",
+    )
+    llm_group.add_argument(
+        "--prune-token-budget",
+        type=int,
+        default=4000,
+        help="Maximum number of tokens kept when pruning (default: %(default)s)",
+    )
+
     config_group = parser.add_argument_group("Model Configuration")
     config_group.add_argument(
         "--examples-path",
@@ -83,22 +130,64 @@ def parse_args(args: List[str]) -> argparse.Namespace:
     output_group = parser.add_argument_group("Output Configuration")
     output_group.add_argument(
         "--output",
-        help="Output file path (supported formats: CSV, JSON)",
+        help="Output file path (supported formats: CSV, JSON, JSONL, Parquet, Arrow)",
         type=str,
     )
+    output_group.add_argument(
+        "--trace",
+        nargs="?",
+        const="trace.json",
+        metavar="TIMELINE",
+        help="Record tracing spans of the batch and write them as a Chrome trace timeline, viewable in Perfetto or speedscope (default: %(const)s)",
+    )
 
-    queue_group = parser.add_argument_group("Queue Configuration")
+    queue_group = parser.add_argument_group("Rate Limit Configuration")
     queue_group.add_argument(
         "--max-items",
         type=int,
         default=60,
-        help="Maximum number of items to process in given time limit (default: %(default)s)",
+        help="Maximum number of LLM requests in given time limit, per provider/model (default: %(default)s)",
     )
     queue_group.add_argument(
         "--time-limit",
         type=int,
         default=1,
-        help="Time limit for maximum number of items in minutes (default: %(default)s)",
+        help="Time limit for maximum number of LLM requests in minutes (default: %(default)s)",
+    )
+    queue_group.add_argument(
+        "--max-tokens-per-minute",
+        type=int,
+        help="Maximum number of estimated input tokens sent per minute, per provider/model (default: no limit)",
+    )
+
+    concurrency_group = parser.add_argument_group("Concurrency Configuration")
+    concurrency_group.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes used for text extraction (OCR) (default: %(default)s)",
+    )
+    concurrency_group.add_argument(
+        "--page-workers",
+        type=int,
+        default=1,
+        help="Number of processes used to OCR the pages of a single PDF (default: %(default)s)",
+    )
+    concurrency_group.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Maximum number of documents sent to the LLM concurrently (default: %(default)s)",
+    )
+    concurrency_group.add_argument(
+        "--queue-size",
+        type=int,
+        help="Maximum number of extracted texts waiting for the LLM (default: 2 x concurrency)",
     )
 
-    return parser.parse_args(args)
+    parsed_args = parser.parse_args(args)
+    try:
+        resolve_chunk_overlap(parsed_args.chunk_size, parsed_args.chunk_overlap)
+    except ValueError as e:
+        parser.error(str(e))
+    return parsed_args
@@ -4,6 +4,7 @@ from rich.syntax import Syntax
 
 from core.exceptions import ValidationError
 from core.models import DataBaseModel
+from core.utils import group_page_ranges
 
 VERSION = "0.1-beta"
 CONSOLE = Console()
@@ -35,6 +36,22 @@ def display_result(result: DataBaseModel) -> None:
     )
 
 
+def format_pages(pages: list[int]) -> str:
+    return ", ".join(
+        str(first) if first == last else f"{first}-{last}"
+        for first, last in group_page_ranges(pages, len(pages))
+    )
+
+
+def display_page_sources(page_sources: dict[str, list[int]]) -> None:
+    report = [
+        f"{label}: {format_pages(page_sources[source])}"
+        for source, label in [("text_layer", "text layer"), ("ocr", "OCR")]
+        if page_sources.get(source)
+    ]
+    CONSOLE.print(f"[dim]  Pages ({'; '.join(report)})[/dim]")
+
+
 def display_results(results: list[str | DataBaseModel]) -> None:
     if results:
         CONSOLE.print("\n[bold green]Successful files:[/bold green]")
@@ -42,6 +59,8 @@ def display_results(results: list[str | DataBaseModel]) -> None:
             if isinstance(result, DataBaseModel):
                 display_result(result)
             CONSOLE.print(f"[green]✓ File {idx}[/green]")
+            if isinstance(result, DataBaseModel) and result.page_sources:
+                display_page_sources(result.page_sources)
 
 
 def display_error(e: Exception) -> None:
@@ -62,6 +81,27 @@ def display_errors(errors: list[ValidationError]) -> None:
             CONSOLE.print(f"[red]✗ {error.file}:[/red] {error.reason}")
 
 
+def display_cache_stats(stats: dict, title: str = "Cache Statistics") -> None:
+    CONSOLE.print(f"[bold green]{title}[/bold green]")
+    CONSOLE.print(
+        f"Hits: {stats['hits']} / Misses: {stats['misses']} "
+        f"({stats['hit_ratio'] * 100:.1f}% hit ratio) / Evictions: {stats['evictions']}"
+    )
+    CONSOLE.print(
+        f"Stored: {stats['entries']} entries, {stats['bytes_stored'] / 1024 / 1024:.1f} MB "
+        f"/ Avg lookup: {stats['avg_lookup_seconds'] * 1000:.2f} ms"
+    )
+
+
+def display_client_pool_stats(stats: dict) -> None:
+    CONSOLE.print("[bold green]LLM Client Pool[/bold green]")
+    CONSOLE.print(
+        f"Clients: {stats['clients']} / Reused: {stats['hits']} time(s) / "
+        f"Setup: {stats['setup_seconds']:.2f}s spent, "
+        f"{stats['avoided_setup_seconds']:.2f}s avoided"
+    )
+
+
 def display_summary(
     results: list[str | DataBaseModel],
     errors: list[ValidationError],
@@ -1,24 +1,110 @@
-from diskcache import Cache
+import json
 import os
-from typing import Any, Optional
+import zlib
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict, Optional
+
+from diskcache import Cache
 from dotenv import load_dotenv
 
 load_dotenv()
 CACHE_DIR: str = os.getenv("CACHE_DIR", "./tmp/cache")
+CACHE_SIZE_LIMIT_MB: int = int(os.getenv("CACHE_SIZE_LIMIT_MB", 1024))
+CACHE_EVICTION_POLICY: str = os.getenv("CACHE_EVICTION_POLICY", "lru")
+CACHE_TTL_SECONDS: int = int(os.getenv("CACHE_TTL_SECONDS", 0))
+CACHE_COMPRESSION_LEVEL: int = int(os.getenv("CACHE_COMPRESSION_LEVEL", 6))
+
+EVICTION_POLICIES = {
+    "lru": "least-recently-used",
+    "lfu": "least-frequently-used",
+    "lrs": "least-recently-stored",
+    "none": "none",
+}
+
 
 class CacheManager:
-    _instance = None
+    _instances: Dict[str, "CacheManager"] = {}
+    _instances_lock = Lock()
+
+    def __new__(
+        cls,
+        cache_dir: str = CACHE_DIR,
+        size_limit_mb: int = CACHE_SIZE_LIMIT_MB,
+        eviction_policy: str = CACHE_EVICTION_POLICY,
+        ttl_seconds: int = CACHE_TTL_SECONDS,
+    ):
+        with cls._instances_lock:
+            if cache_dir not in cls._instances:
+                if eviction_policy not in EVICTION_POLICIES:
+                    raise ValueError(f"Unknown eviction policy: {eviction_policy}")
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-            load_dotenv()
-            cls._instance.cache_dir = CACHE_DIR
-            cls._instance.cache = Cache(cls._instance.cache_dir)
-        return cls._instance
+                instance = super().__new__(cls)
+                instance.cache_dir = cache_dir
+                instance.ttl_seconds = ttl_seconds or None
+                instance.cache = Cache(
+                    cache_dir,
+                    size_limit=size_limit_mb * 1024 * 1024,
+                    eviction_policy=EVICTION_POLICIES[eviction_policy],
+                    # Culling is done in set() so that evictions can be counted
+                    cull_limit=0,
+                )
+                instance.cache.stats(enable=True)
+                instance._lock = Lock()
+                instance._evictions = 0
+                instance._lookups = 0
+                instance._lookup_seconds = 0.0
+                cls._instances[cache_dir] = instance
+        return cls._instances[cache_dir]
 
     def get(self, key: str) -> Optional[Any]:
-        return self.cache.get(key)
+        start = perf_counter()
+        payload = self.cache.get(key)
+        elapsed = perf_counter() - start
+
+        with self._lock:
+            self._lookups += 1
+            self._lookup_seconds += elapsed
+
+        if payload is None:
+            return None
+        return json.loads(zlib.decompress(payload))
 
     def set(self, key: str, value: Any) -> None:
-        self.cache.set(key, value)
+        payload = zlib.compress(
+            json.dumps(value, ensure_ascii=False).encode(), CACHE_COMPRESSION_LEVEL
+        )
+        self.cache.set(key, payload, expire=self.ttl_seconds)
+        if self.cache.volume() <= self.cache.size_limit:
+            return
+
+        # Expired entries are dropped first so that only the entries removed
+        # by the eviction policy are counted
+        self.cache.expire()
+        evicted = self.cache.cull()
+        if evicted > 0:
+            with self._lock:
+                self._evictions += evicted
+
+    def stats(self) -> Dict[str, Any]:
+        hits, misses = self.cache.stats()
+        with self._lock:
+            lookups, lookup_seconds = self._lookups, self._lookup_seconds
+            evictions = self._evictions
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+            "evictions": evictions,
+            "entries": len(self.cache),
+            "bytes_stored": self.cache.volume(),
+            "lookups": lookups,
+            "avg_lookup_seconds": lookup_seconds / lookups if lookups else 0.0,
+        }
+
+    def reset_stats(self) -> None:
+        self.cache.stats(enable=True, reset=True)
+        with self._lock:
+            self._evictions = 0
+            self._lookups = 0
+            self._lookup_seconds = 0.0
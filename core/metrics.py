@@ -0,0 +1,213 @@
+from contextlib import contextmanager
+from threading import Lock
+from time import perf_counter
+from typing import Dict, Iterator, List, Tuple
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    30,
+    60,
+    120,
+    300,
+)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    Metric in the Prometheus text exposition format. Label values are given
+    as keyword arguments, every label of the metric being required.
+    """
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self._samples())
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Tuple[str, ...] = (),
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._histograms: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # Per bucket counts, then sum and count
+            histogram = self._histograms.setdefault(
+                key, [0] * len(self.buckets) + [0.0, 0]
+            )
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram[index] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            histograms = [
+                (key, list(values)) for key, values in self._histograms.items()
+            ]
+
+        lines = []
+        names = self.label_names + ("le",)
+        for key, histogram in histograms:
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram):
+                cumulative += count
+                labels = _format_labels(names, key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(histogram[-2])}")
+            lines.append(f"{self.name}_count{labels} {histogram[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+JOBS = REGISTRY.register(
+    Counter("extrix_jobs_total", "Extraction jobs by status reached", ("status",))
+)
+ACTIVE_JOBS = REGISTRY.register(
+    Gauge("extrix_jobs_active", "Pending and processing jobs in the job store")
+)
+STAGE_DURATION = REGISTRY.register(
+    Histogram(
+        "extrix_stage_duration_seconds",
+        "Duration of the extraction stages",
+        ("stage",),
+    )
+)
+CACHE_HITS = REGISTRY.register(
+    Gauge("extrix_cache_hits", "Cache hits since the cache was created", ("cache",))
+)
+CACHE_MISSES = REGISTRY.register(
+    Gauge("extrix_cache_misses", "Cache misses since the cache was created", ("cache",))
+)
+CACHE_HIT_RATIO = REGISTRY.register(
+    Gauge("extrix_cache_hit_ratio", "Cache hits over lookups", ("cache",))
+)
+LLM_CALLS = REGISTRY.register(
+    Counter(
+        "extrix_llm_calls_total",
+        "LLM calls, cached responses included",
+        ("provider", "model", "outcome"),
+    )
+)
+LLM_TOKENS = REGISTRY.register(
+    Counter(
+        "extrix_llm_tokens_total",
+        "LLM tokens by direction",
+        ("provider", "model", "direction"),
+    )
+)
+LLM_COST = REGISTRY.register(
+    Counter("extrix_llm_cost_usd_total", "Estimated LLM cost", ("provider", "model"))
+)
+LLM_DURATION = REGISTRY.register(
+    Histogram(
+        "extrix_llm_call_duration_seconds",
+        "Duration of the LLM calls",
+        ("provider", "model"),
+    )
+)
+RATE_LIMIT_WAIT = REGISTRY.register(
+    Histogram(
+        "extrix_rate_limit_wait_seconds",
+        "Time spent waiting for the LLM rate limiter",
+        ("provider", "model"),
+        buckets=(0, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+    )
+)
@@ -95,6 +95,25 @@ class ModelFactory:
 
         return model
 
+    @staticmethod
+    def create_partial_model(
+        model: type[DataBaseModel], field_names: List[str] | None = None
+    ) -> type[DataBaseModel]:
+        fields = {
+            name: (
+                Optional[field.annotation],
+                Field(default=None, title=field.title, description=field.description),
+            )
+            for name, field in model.model_fields.items()
+            if field_names is None or name in field_names
+        }
+        return create_model(
+            f"Partial{model.__name__}",
+            __module__=__name__,
+            __base__=DataBaseModel,
+            **fields,  # type: ignore
+        )
+
     @staticmethod
     def load_model_json(data: Dict[str, Any]) -> type[DataBaseModel]:
         model_json = ModelJson.model_validate(data)
@@ -104,17 +123,3 @@ class ModelFactory:
     def load_model_json_file(file_path: Path) -> type[DataBaseModel]:
         data = load_json_file(file_path)
         return ModelFactory.load_model_json(data)
-
-
-"""    @staticmethod
-    def write_output(model: BaseModel, output_path: Path) -> None:
-        path = Path(output_path)
-        format_extension = path.suffix.lower()[1:]
-
-        if format_extension not in ["json", "csv"]:
-            raise ValueError(f"Unsupported output format: {format_extension}")
-
-        if format_extension == "json":
-            write_json(path, model.model_dump())
-        else:  # csv
-            write_csv(path, model.model_dump_csv())"""
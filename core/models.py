@@ -1,10 +1,25 @@
 from datetime import datetime, date
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from dateutil.relativedelta import relativedelta
-from pydantic import BaseModel, Field, field_validator, ValidationInfo
+from pydantic import BaseModel, Field, PrivateAttr, field_validator, ValidationInfo
 
 
 class DataBaseModel(BaseModel):
+    # Not part of the extracted data, kept out of dumps and outputs
+    _page_sources: Optional[Dict[str, List[int]]] = PrivateAttr(default=None)
+
+    @property
+    def page_sources(self) -> Optional[Dict[str, List[int]]]:
+        """
+        Page numbers of the source document per origin of their text,
+        "text_layer" or "ocr", when the text extractor decided per page
+        """
+        return self._page_sources
+
+    @page_sources.setter
+    def page_sources(self, value: Optional[Dict[str, List[int]]]) -> None:
+        self._page_sources = value
+
     def model_dump_csv(self) -> Dict[str, str]:
         dump = self.model_dump(mode="python")
         return {
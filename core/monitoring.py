@@ -1,66 +1,439 @@
+import atexit
+from functools import lru_cache
+import json
 import os
 from pathlib import Path
+from threading import Event, Lock, RLock, Thread
+from time import monotonic
 from typing import Dict, Any, List
+from uuid import UUID
 from datetime import datetime
 from langchain.callbacks.base import BaseCallbackHandler
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
 from dotenv import load_dotenv
 
-from core.utils import write_json, load_json_file, write_monitoring_data
+from core.metrics import LLM_CALLS, LLM_COST, LLM_DURATION, LLM_TOKENS
+from core.tokens import count_tokens
+from core.utils import (
+    FILE_ENCODING,
+    JSON_IDENTATION,
+    ensure_dir_exists,
+    load_json_array,
+    load_json_file,
+    update_monitoring_entry,
+)
 
 load_dotenv()
 MONITORING_FILE_PATH = os.getenv("MONITORING_FILE_PATH", "monitoring.json")
+MONITORING_EVENTS_PATH = os.getenv("MONITORING_EVENTS_PATH", "monitoring.jsonl")
+MONITORING_FLUSH_SECONDS = float(os.getenv("MONITORING_FLUSH_SECONDS", 1))
+MONITORING_ROLLUP_SECONDS = float(os.getenv("MONITORING_ROLLUP_SECONDS", 60))
 COST_MAPPING_PATH = os.getenv("COST_MAPPING_PATH", "config/cost_mapping.json")
 TOKENS_INPUT_PRICING_UNIT = int(os.getenv("TOKENS_INPUT_PRICING_UNIT", 1000000))
 TOKENS_OUTPUT_PRICING_UNIT = int(os.getenv("TOKENS_OUTPUT_PRICING_UNIT", 1000000))
 
+
+@lru_cache
+def _load_cost_mapping(path: str) -> Dict[str, Any]:
+    return load_json_file(Path(path))
+
+
+class MonitoringLog:
+    """
+    Append-only log of LLM call events shared by every process. Recording an
+    event only appends it to an in-memory buffer; a background thread writes
+    the buffer to the JSONL log in a single append and periodically rolls
+    the log up into the per provider/model totals of MONITORING_FILE_PATH.
+    The totals are saved with the log offset they account for, so a rollup
+    only reads the events logged since the last one of any process.
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self.events_path = Path(MONITORING_EVENTS_PATH)
+        self.rollup_path = Path(MONITORING_FILE_PATH)
+        self.state_path = self.rollup_path.with_name(
+            f"{self.rollup_path.stem}.rollup.json"
+        )
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_lock = Lock()
+        self._rollup_lock = RLock()
+        self._rollup: Dict[tuple[str, str], Dict[str, Any]] = {}
+        self._rollup_offset = 0
+        self._last_rollup = monotonic()
+        self._stop = Event()
+        self._pid = None
+        self._import_legacy_totals()
+        atexit.register(self.close)
+
+    def _import_legacy_totals(self) -> None:
+        # Totals written before the event log existed become its first events
+        if self.events_path.exists() or not self.rollup_path.exists():
+            return
+        entries = load_json_array(self.rollup_path)
+
+        ensure_dir_exists(self.events_path)
+        try:
+            # Only the process creating the log imports, or totals would be
+            # counted once per process starting at the same time
+            fd = os.open(
+                self.events_path,
+                os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_EXCL,
+                0o644,
+            )
+        except FileExistsError:
+            return
+        try:
+            os.write(
+                fd,
+                "".join(
+                    json.dumps(
+                        {**entry, "cache_hits": entry.get("cache_hits", 0)},
+                        ensure_ascii=False,
+                    )
+                    + "\n"
+                    for entry in entries
+                ).encode(FILE_ENCODING),
+            )
+        finally:
+            os.close(fd)
+
+    def _ensure_flusher(self) -> None:
+        # Threads do not survive a fork, so each process starts its own
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            Thread(target=self._run_flusher, daemon=True).start()
+
+    def _run_flusher(self) -> None:
+        while not self._stop.wait(MONITORING_FLUSH_SECONDS):
+            self.flush()
+            if monotonic() - self._last_rollup >= MONITORING_ROLLUP_SECONDS:
+                self.rollup()
+
+    def record(self, event: Dict[str, Any]) -> None:
+        with self._buffer_lock:
+            self._buffer.append(event)
+            self._ensure_flusher()
+
+    def flush(self) -> None:
+        with self._buffer_lock:
+            events, self._buffer = self._buffer, []
+        if not events:
+            return
+
+        content = "".join(
+            json.dumps(event, ensure_ascii=False) + "\n" for event in events
+        ).encode(FILE_ENCODING)
+        ensure_dir_exists(self.events_path)
+        # A single O_APPEND write keeps lines of concurrent processes whole
+        fd = os.open(self.events_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, content)
+        finally:
+            os.close(fd)
+
+    def summarize(self) -> List[Dict[str, Any]]:
+        """
+        Totals per provider/model of every event logged so far
+
+        Returns:
+            One monitoring entry per provider/model
+        """
+        with self._rollup_lock:
+            if self.events_path.exists():
+                self._resume_rollup()
+                with open(self.events_path, "rb") as f:
+                    f.seek(self._rollup_offset)
+                    content = f.read()
+                # Leave a line still being written for the next rollup
+                complete = content[: content.rfind(b"\n") + 1]
+                self._rollup_offset += len(complete)
+
+                for line in complete.decode(FILE_ENCODING).splitlines():
+                    if not line.strip():
+                        continue
+                    event = json.loads(line)
+                    key = (event["provider"], event["model"])
+                    if key not in self._rollup:
+                        self._rollup[key] = {
+                            name: event[name]
+                            for name in ["timestamp", "model", "provider"]
+                        }
+                    update_monitoring_entry(self._rollup[key], event)
+            return [dict(entry) for entry in self._rollup.values()]
+
+    def _resume_rollup(self) -> None:
+        # Start from the totals saved by the most advanced rollup, unless the
+        # log they were computed from has since been truncated or replaced
+        size = self.events_path.stat().st_size
+        if self._rollup_offset > size:
+            self._rollup_offset, self._rollup = 0, {}
+        if not self.state_path.exists():
+            return
+        try:
+            state = load_json_file(self.state_path)
+        except json.JSONDecodeError:
+            return
+        if (
+            state["events_path"] == str(self.events_path.resolve())
+            and self._rollup_offset < state["offset"] <= size
+        ):
+            self._rollup_offset = state["offset"]
+            self._rollup = {
+                (entry["provider"], entry["model"]): entry for entry in state["entries"]
+            }
+
+    def _write_atomically(self, path: Path, data: Any) -> None:
+        ensure_dir_exists(path)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(
+            json.dumps(data, indent=JSON_IDENTATION, ensure_ascii=False),
+            encoding=FILE_ENCODING,
+        )
+        os.replace(tmp_path, path)
+
+    def rollup(self) -> None:
+        self._last_rollup = monotonic()
+        with self._rollup_lock:
+            entries = self.summarize()
+            if not entries:
+                return
+            state = {
+                "events_path": str(self.events_path.resolve()),
+                "offset": self._rollup_offset,
+                "entries": entries,
+            }
+
+        self._write_atomically(self.rollup_path, entries)
+        self._write_atomically(self.state_path, state)
+
+    def close(self) -> None:
+        self._stop.set()
+        self.flush()
+        self.rollup()
+
+
+class _RunState:
+    def __init__(self, input_tokens: int):
+        self.start = monotonic()
+        self.first_token: float | None = None
+        self.input_tokens = input_tokens
+
+
+def _message_text(message: BaseMessage) -> str:
+    if isinstance(message.content, str):
+        return message.content
+    return json.dumps(message.content, ensure_ascii=False, default=str)
+
+
+def _provider_usage(response: LLMResult) -> tuple[int, int] | None:
+    input_tokens = output_tokens = 0
+    found = False
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(
+                getattr(generation, "message", None), "usage_metadata", None
+            )
+            if usage:
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+                found = True
+    if found:
+        return input_tokens, output_tokens
+
+    llm_output = response.llm_output or {}
+    usage = llm_output.get("token_usage") or llm_output.get("usage") or {}
+    if isinstance(usage, dict) and usage:
+        return (
+            usage.get("prompt_tokens", usage.get("input_tokens", 0)),
+            usage.get("completion_tokens", usage.get("output_tokens", 0)),
+        )
+    return None
+
+
+def _error_usage(error: BaseException) -> tuple[int, int] | None:
+    # Some providers attach the usage of a failed call to the exception
+    usage = getattr(error, "usage_metadata", None) or getattr(error, "usage", None)
+    if isinstance(usage, dict):
+        return (
+            usage.get("input_tokens", usage.get("prompt_tokens", 0)),
+            usage.get("output_tokens", usage.get("completion_tokens", 0)),
+        )
+    return None
+
+
+def _estimated_output_tokens(response: LLMResult) -> int:
+    tokens = 0
+    for generations in response.generations:
+        for generation in generations:
+            tokens += count_tokens(generation.text)
+            message = getattr(generation, "message", None)
+            if message is not None and getattr(message, "tool_calls", None):
+                tokens += count_tokens(
+                    json.dumps(
+                        [call["args"] for call in message.tool_calls],
+                        ensure_ascii=False,
+                        default=str,
+                    )
+                )
+    return tokens
+
+
 class MonitoringCallbackHandler(BaseCallbackHandler):
+    """
+    Records one monitoring event per LLM call, with the token counts reported
+    by the provider, or estimated locally when it reports none. State is kept
+    per run id since a handler is shared by concurrent calls.
+    """
+
     def __init__(self, model: str, provider: str):
         super().__init__()
         self.model = model
         self.provider = provider
-        self.start_time = None
-        self.end_time = None
-        self.input_tokens = 0
-        self.output_tokens = 0
-        self._cost_mapping = load_json_file(COST_MAPPING_PATH)
-        
-    def on_llm_start(self, *args, **kwargs):
-        self.start_time = datetime.now()
-
-    def on_llm_end(self, *args, **kwargs):
-        self._save_monitoring()
-
-    def on_llm_error(self, error: str, *args, **kwargs):
-        self._save_monitoring()
-
-    def on_llm_new_token(self, token: str, *args, **kwargs):
-        self.output_tokens += 1
-
-    def _calculate_cost(self) -> float:
-        provider_costs = self._cost_mapping.get(self.provider, self._cost_mapping["default"])
+        self.structured_output = None
+        self._runs: Dict[UUID, _RunState] = {}
+        self._runs_lock = Lock()
+        self._cost_mapping = _load_cost_mapping(COST_MAPPING_PATH)
+
+    def _start_run(self, run_id: UUID, input_tokens: int) -> None:
+        with self._runs_lock:
+            self._runs[run_id] = _RunState(input_tokens)
+
+    def _end_run(self, run_id: UUID) -> _RunState:
+        with self._runs_lock:
+            return self._runs.pop(run_id, None) or _RunState(0)
+
+    def on_llm_start(
+        self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID, **kwargs
+    ):
+        self._start_run(run_id, sum(count_tokens(prompt) for prompt in prompts))
+
+    def on_chat_model_start(
+        self,
+        serialized: Dict[str, Any],
+        messages: List[List[BaseMessage]],
+        *,
+        run_id: UUID,
+        **kwargs,
+    ):
+        self._start_run(
+            run_id,
+            sum(
+                count_tokens(_message_text(message))
+                for batch in messages
+                for message in batch
+            ),
+        )
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs):
+        with self._runs_lock:
+            run = self._runs.get(run_id)
+            if run is not None and run.first_token is None:
+                run.first_token = monotonic()
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs):
+        run = self._end_run(run_id)
+        usage = _provider_usage(response)
+        if usage is not None:
+            input_tokens, output_tokens = usage
+        else:
+            input_tokens = run.input_tokens
+            output_tokens = _estimated_output_tokens(response)
+        self._save_monitoring(
+            run,
+            input_tokens,
+            output_tokens,
+            "provider" if usage else "estimated",
+            "success",
+        )
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs):
+        # Failed attempts (rate limits, timeouts, 5xx) are usually not billed
+        # and are retried: only usage reported by the provider is counted
+        run = self._end_run(run_id)
+        usage = _error_usage(error)
+        if usage is not None:
+            self._save_monitoring(run, *usage, "provider", "error")
+        else:
+            self._save_monitoring(run, 0, 0, None, "error")
+
+    def record_cache_hit(self):
+        # A cached response costs nothing: record a call without tokens
+        data = self._get_monitoring_data(0, 0, 0, None, None)
+        data["cache_hits"] = 1
+        MonitoringLog().record(data)
+        LLM_CALLS.inc(provider=self.provider, model=self.model, outcome="cache_hit")
+
+    def _calculate_cost(self, input_tokens: int, output_tokens: int) -> float:
+        provider_costs = self._cost_mapping.get(
+            self.provider, self._cost_mapping["default"]
+        )
         model_costs = provider_costs.get(self.model, provider_costs.get("default"))
-        
+
         return round(
-            (self.input_tokens * model_costs["input"] / TOKENS_INPUT_PRICING_UNIT) +
-            (self.output_tokens * model_costs["output"] / TOKENS_OUTPUT_PRICING_UNIT),
-            4
+            (input_tokens * model_costs["input"] / TOKENS_INPUT_PRICING_UNIT)
+            + (output_tokens * model_costs["output"] / TOKENS_OUTPUT_PRICING_UNIT),
+            4,
         )
 
-    def _get_monitoring_data(self) -> Dict[str, Any]:
-        duration = (self.end_time - self.start_time).total_seconds() if self.end_time else 0
+    def _get_monitoring_data(
+        self,
+        duration: float,
+        input_tokens: int,
+        output_tokens: int,
+        time_to_first_token: float | None,
+        token_source: str | None,
+    ) -> Dict[str, Any]:
         return {
             "timestamp": datetime.now().isoformat(),
             "model": self.model,
             "provider": self.provider,
             "duration_seconds": duration,
-            "input_tokens": self.input_tokens,
-            "output_tokens": self.output_tokens,
-            "total_tokens": self.input_tokens + self.output_tokens,
-            "estimated_cost_usd": self._calculate_cost()
+            "time_to_first_token_seconds": time_to_first_token,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "token_source": token_source,
+            "estimated_cost_usd": self._calculate_cost(input_tokens, output_tokens),
+            "cache_hits": 0,
+            "structured_output": self.structured_output,
         }
 
-    def _save_monitoring(self):
-        self.end_time = datetime.now()
-        monitoring_file = Path(MONITORING_FILE_PATH)
-        new_data = self._get_monitoring_data()
-        write_monitoring_data(monitoring_file, new_data)
+    def _save_monitoring(
+        self,
+        run: _RunState,
+        input_tokens: int,
+        output_tokens: int,
+        token_source: str | None,
+        outcome: str,
+    ):
+        end = monotonic()
+        time_to_first_token = (
+            run.first_token - run.start if run.first_token is not None else None
+        )
+        data = self._get_monitoring_data(
+            end - run.start,
+            input_tokens,
+            output_tokens,
+            time_to_first_token,
+            token_source,
+        )
+        MonitoringLog().record(data)
+
+        labels = {"provider": self.provider, "model": self.model}
+        LLM_CALLS.inc(outcome=outcome, **labels)
+        LLM_TOKENS.inc(input_tokens, direction="input", **labels)
+        LLM_TOKENS.inc(output_tokens, direction="output", **labels)
+        LLM_COST.inc(data["estimated_cost_usd"], **labels)
+        LLM_DURATION.observe(data["duration_seconds"], **labels)
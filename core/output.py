@@ -0,0 +1,303 @@
+from abc import ABC, abstractmethod
+import csv
+from datetime import datetime
+import json
+import os
+from pathlib import Path
+from textwrap import indent
+from threading import Lock
+from time import monotonic
+from types import NoneType, UnionType
+from typing import IO, Any, Dict, List, Union, get_args, get_origin
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from core.models import DataBaseModel
+from core.utils import FILE_ENCODING, JSON_IDENTATION, ensure_dir_exists
+
+load_dotenv()
+OUTPUT_BUFFER_SIZE = int(os.getenv("OUTPUT_BUFFER_SIZE", 64 * 1024))
+OUTPUT_FSYNC_SECONDS = float(os.getenv("OUTPUT_FSYNC_SECONDS", 5))
+OUTPUT_ROW_GROUP_SIZE = int(os.getenv("OUTPUT_ROW_GROUP_SIZE", 1000))
+
+
+class OutputSink(ABC):
+    """
+    Output file kept open for a whole batch. Records are appended through a
+    buffer and synced to disk at most every `fsync_seconds` (0 syncs every
+    record). Writes are serialized so parallel workers can share a sink.
+    The file is only created by the first record.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        buffer_size: int = OUTPUT_BUFFER_SIZE,
+        fsync_seconds: float = OUTPUT_FSYNC_SECONDS,
+    ):
+        self.path = path
+        self.count = 0
+        self._buffer_size = buffer_size
+        self._fsync_seconds = fsync_seconds
+        self._file: IO | None = None
+        self._closed = False
+        self._lock = Lock()
+        self._last_sync = monotonic()
+
+    @abstractmethod
+    def _open(self) -> IO:
+        pass
+
+    @abstractmethod
+    def _write_record(self, record: DataBaseModel) -> None:
+        pass
+
+    def _finalize(self) -> None:
+        pass
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._last_sync = monotonic()
+
+    def write(self, record: DataBaseModel) -> None:
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"Output {self.path} is already closed")
+            if self._file is None:
+                ensure_dir_exists(self.path)
+                self._file = self._open()
+
+            self._write_record(record)
+            self.count += 1
+            if monotonic() - self._last_sync >= self._fsync_seconds:
+                self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            if self._file is not None:
+                self._finalize()
+                self._sync()
+                self._file.close()
+
+    def __enter__(self) -> "OutputSink":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+class JSONLinesSink(OutputSink):
+    def _open(self) -> IO:
+        return open(self.path, "a", encoding=FILE_ENCODING, buffering=self._buffer_size)
+
+    def _write_record(self, record: DataBaseModel) -> None:
+        self._file.write(
+            json.dumps(record.model_dump(mode="json"), ensure_ascii=False) + "\n"
+        )
+
+
+class JSONArraySink(OutputSink):
+    """
+    JSON array appended in place: an existing array is reopened before its
+    closing bracket, which is written back when the sink is closed.
+    """
+
+    def _open(self) -> IO:
+        if not self.path.exists() or self.path.stat().st_size == 0:
+            file = open(self.path, "wb", buffering=self._buffer_size)
+            file.write(b"[")
+            self._empty = True
+            return file
+
+        file = open(self.path, "r+b", buffering=self._buffer_size)
+        position, char = self._last_char(file, file.seek(0, os.SEEK_END))
+        # A file left without its closing bracket by a crash is reopened as is
+        if char == b"]":
+            position, char = self._last_char(file, position)
+        if char not in (b"[", b"}"):
+            file.close()
+            raise ValueError(f"{self.path} does not contain a JSON array")
+
+        file.seek(position + 1)
+        file.truncate()
+        self._empty = char == b"["
+        return file
+
+    @staticmethod
+    def _last_char(file: IO, end: int) -> tuple[int, bytes]:
+        for position in range(end - 1, -1, -1):
+            file.seek(position)
+            char = file.read(1)
+            if not char.isspace():
+                return position, char
+        return -1, b""
+
+    def _write_record(self, record: DataBaseModel) -> None:
+        content = json.dumps(
+            record.model_dump(mode="json"), indent=JSON_IDENTATION, ensure_ascii=False
+        )
+        separator = "\n" if self._empty else ",\n"
+        self._file.write(
+            (separator + indent(content, " " * JSON_IDENTATION)).encode(FILE_ENCODING)
+        )
+        self._empty = False
+
+    def _finalize(self) -> None:
+        self._file.write(b"\n]")
+
+
+class CSVSink(OutputSink):
+    def _open(self) -> IO:
+        is_new = not self.path.exists() or self.path.stat().st_size == 0
+        file = open(
+            self.path,
+            "a",
+            encoding=FILE_ENCODING,
+            newline="",
+            buffering=self._buffer_size,
+        )
+        self._writer = csv.writer(file)
+        self._write_headers = is_new
+        return file
+
+    def _write_record(self, record: DataBaseModel) -> None:
+        row = record.model_dump_csv()
+        if self._write_headers:
+            self._writer.writerow(row.keys())
+            self._write_headers = False
+        self._writer.writerow(row.values())
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "pyarrow is required for Parquet and Arrow output: pip install pyarrow"
+        ) from e
+    return pyarrow
+
+
+def _arrow_type(annotation: Any):
+    pa = _import_pyarrow()
+
+    if get_origin(annotation) in (Union, UnionType):
+        args = [arg for arg in get_args(annotation) if arg is not NoneType]
+        return _arrow_type(args[0]) if len(args) == 1 else pa.string()
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return arrow_schema(annotation)
+    # bool is checked before int since it is a subclass of int
+    for python_type, arrow_type in [
+        (bool, pa.bool_()),
+        (int, pa.int64()),
+        (float, pa.float64()),
+        (datetime, pa.timestamp("us")),
+        (str, pa.string()),
+    ]:
+        if isinstance(annotation, type) and issubclass(annotation, python_type):
+            return arrow_type
+    return pa.string()
+
+
+def arrow_schema(model: type[BaseModel]):
+    """
+    Arrow type of a model, nested models becoming struct columns
+
+    Returns:
+        pyarrow.StructType with one field per model field
+    """
+    pa = _import_pyarrow()
+    fields = [
+        pa.field(name, _arrow_type(field.annotation))
+        for name, field in model.model_fields.items()
+    ]
+    return pa.struct(fields)
+
+
+class ColumnarSink(OutputSink):
+    """
+    Columnar output whose schema is derived from the model of the first
+    record. Rows are buffered and written as row groups (record batches) of
+    `row_group_size`, so memory stays flat whatever the batch size. Columnar
+    files cannot be appended to: an existing file is replaced.
+    """
+
+    def __init__(
+        self, path: Path, row_group_size: int = OUTPUT_ROW_GROUP_SIZE, **kwargs
+    ):
+        super().__init__(path, **kwargs)
+        self._row_group_size = row_group_size
+        self._rows: List[Dict[str, Any]] = []
+        self._schema = None
+        self._writer = None
+
+    def _open(self) -> IO:
+        return open(self.path, "wb", buffering=self._buffer_size)
+
+    @abstractmethod
+    def _create_writer(self, schema):
+        pass
+
+    @abstractmethod
+    def _write_table(self, table) -> None:
+        pass
+
+    def _flush_rows(self) -> None:
+        if self._rows:
+            pa = _import_pyarrow()
+            self._write_table(pa.Table.from_pylist(self._rows, schema=self._schema))
+            self._rows = []
+
+    def _write_record(self, record: DataBaseModel) -> None:
+        if self._writer is None:
+            pa = _import_pyarrow()
+            self._schema = pa.schema(list(arrow_schema(type(record))))
+            self._writer = self._create_writer(self._schema)
+
+        self._rows.append(record.model_dump(mode="python"))
+        if len(self._rows) >= self._row_group_size:
+            self._flush_rows()
+
+    def _finalize(self) -> None:
+        self._flush_rows()
+        self._writer.close()
+
+
+class ParquetSink(ColumnarSink):
+    def _create_writer(self, schema):
+        import pyarrow.parquet as pq
+
+        return pq.ParquetWriter(self._file, schema)
+
+    def _write_table(self, table) -> None:
+        self._writer.write_table(table, row_group_size=self._row_group_size)
+
+
+class ArrowSink(ColumnarSink):
+    def _create_writer(self, schema):
+        pa = _import_pyarrow()
+        return pa.ipc.new_file(self._file, schema)
+
+    def _write_table(self, table) -> None:
+        self._writer.write_table(table, max_chunksize=self._row_group_size)
+
+
+SINKS: dict[str, type[OutputSink]] = {
+    "jsonl": JSONLinesSink,
+    "json": JSONArraySink,
+    "csv": CSVSink,
+    "parquet": ParquetSink,
+    "arrow": ArrowSink,
+}
+
+
+def open_sink(output: str, **kwargs) -> OutputSink:
+    extension = output.split(".")[-1].lower()
+    if extension not in SINKS:
+        raise ValueError(f"Unsupported output format: {extension}")
+    return SINKS[extension](Path(output), **kwargs)
@@ -0,0 +1,197 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from queue import Empty, Queue
+from threading import Lock, Thread
+from time import perf_counter
+from typing import Awaitable, Callable, Iterator, NamedTuple
+
+from core.exceptions import ValidationError
+from core.metrics import STAGE_DURATION
+from core.models import DataBaseModel
+from core.tracing import (
+    Span,
+    SpanContext,
+    bind,
+    current_context,
+    start_span,
+    use_context,
+)
+from text_extractor.text_extractor import TextContent
+
+
+class TextItem(NamedTuple):
+    index: int
+    file_path: Path
+    text: TextContent | None
+    error: str | None
+    span: Span
+
+
+class StageStats:
+    def __init__(self):
+        self._lock = Lock()
+        self.count = 0
+        self.total_seconds = 0.0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total_seconds += seconds
+
+    @property
+    def average_seconds(self) -> float:
+        return self.total_seconds / self.count if self.count else 0.0
+
+
+class ExtractionPipeline:
+    """
+    Two-stage producer/consumer pipeline: text extraction runs in a process
+    pool and feeds a bounded queue consumed by an event loop running up to
+    `concurrency` data extractions at once, so the OCR of a document overlaps
+    with the LLM calls of the previous ones.
+    """
+
+    def __init__(
+        self,
+        text_fn: Callable[[Path], TextContent],
+        data_fn: Callable[[str], Awaitable[DataBaseModel]],
+        workers: int = 1,
+        concurrency: int = 1,
+        queue_size: int | None = None,
+    ):
+        self._text_fn = text_fn
+        self._data_fn = data_fn
+        self.workers = max(workers, 1)
+        self.concurrency = max(concurrency, 1)
+        self.queue_size = queue_size or self.concurrency * 2
+        self.text_queue: Queue[TextItem | None] = Queue(maxsize=self.queue_size)
+        self.text_stats = StageStats()
+        self.data_stats = StageStats()
+
+    def _text_stage(
+        self,
+        executor: Executor,
+        pending: Iterator[tuple[int, Path]],
+        pending_lock: Lock,
+        parent: SpanContext | None,
+    ) -> None:
+        while True:
+            with pending_lock:
+                item = next(pending, None)
+            if item is None:
+                return
+
+            index, file_path = item
+            # The document span is ended by the data stage
+            document = start_span(
+                "document", {"job.id": str(index), "file.name": file_path.name}, parent
+            )
+            start = perf_counter()
+            try:
+                text_fn = bind(self._text_fn, document.context())
+                text = executor.submit(text_fn, file_path).result()
+                text_item = TextItem(index, file_path, text, None, document)
+            except Exception as e:
+                text_item = TextItem(index, file_path, None, str(e), document)
+            elapsed = perf_counter() - start
+            self.text_stats.record(elapsed)
+            STAGE_DURATION.observe(elapsed, stage="extract_text")
+
+            # Blocks while the queue is full so OCR never runs too far ahead
+            self.text_queue.put(text_item)
+
+    async def _extract_data(self, item: TextItem, results: Queue) -> None:
+        start = perf_counter()
+        try:
+            with use_context(item.span.context()):
+                result = await self._data_fn(item.text.text)
+            result.page_sources = item.text.page_sources
+        except Exception as e:
+            result = ValidationError(item.file_path, str(e))
+            item.span.record_error(e)
+        self.data_stats.record(perf_counter() - start)
+        item.span.end()
+        results.put((item.index, result))
+
+    async def _data_stage(self, results: Queue) -> None:
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks: set[asyncio.Task] = set()
+
+        async def run_item(item: TextItem) -> None:
+            try:
+                await self._extract_data(item, results)
+            finally:
+                slots.release()
+
+        while True:
+            # Only take a text off the queue once a slot is free, so the queue
+            # keeps applying backpressure on the text stage
+            await slots.acquire()
+            item = await loop.run_in_executor(None, self.text_queue.get)
+            if item is None:
+                break
+            if item.error is not None:
+                item.span.record_error(item.error)
+                item.span.end()
+                results.put((item.index, ValidationError(item.file_path, item.error)))
+                slots.release()
+                continue
+
+            task = asyncio.create_task(run_item(item))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        await asyncio.gather(*tasks)
+
+    def run(
+        self,
+        files_path: list[Path],
+        on_result: Callable[[int, DataBaseModel | ValidationError], None],
+        on_tick: Callable[[], None] | None = None,
+        tick_seconds: float = 1.0,
+    ) -> None:
+        results: Queue = Queue()
+        pending = iter(enumerate(files_path))
+        pending_lock = Lock()
+        # Threads do not inherit the context, the parent span is passed along
+        parent = current_context()
+
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            text_threads = [
+                Thread(
+                    target=self._text_stage,
+                    args=(executor, pending, pending_lock, parent),
+                    daemon=True,
+                )
+                for _ in range(self.workers)
+            ]
+            data_thread = Thread(
+                target=asyncio.run, args=(self._data_stage(results),), daemon=True
+            )
+            for thread in text_threads + [data_thread]:
+                thread.start()
+
+            received = 0
+            while received < len(files_path):
+                try:
+                    index, result = results.get(timeout=tick_seconds)
+                except Empty:
+                    if on_tick:
+                        on_tick()
+                    continue
+                received += 1
+                on_result(index, result)
+
+            for thread in text_threads:
+                thread.join()
+            self.text_queue.put(None)
+            data_thread.join()
+
+    def status(self) -> str:
+        return (
+            f"queue {self.text_queue.qsize()}/{self.queue_size}"
+            f" · OCR {self.text_stats.average_seconds:.1f}s"
+            f" · LLM {self.data_stats.average_seconds:.1f}s"
+        )
@@ -0,0 +1,310 @@
+import asyncio
+import os
+from pathlib import Path
+import sqlite3
+from threading import Lock, local
+from time import monotonic, sleep, time
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+from core.metrics import RATE_LIMIT_WAIT
+
+load_dotenv()
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "sqlite")
+RATE_LIMIT_PATH = os.getenv("RATE_LIMIT_PATH", "./tmp/rate_limits.db")
+
+
+class TokenBucket:
+    """
+    Bucket holding up to `capacity` units, refilled continuously at `rate`
+    units per second. The level is known at time `updated`, which may be in
+    the future when later callers already reserved units.
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        rate: float,
+        level: float | None = None,
+        updated: float = 0.0,
+    ):
+        self.capacity = capacity
+        self.rate = rate
+        self.level = capacity if level is None else level
+        self.updated = updated
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            elapsed = now - self.updated
+            self.level = min(self.capacity, self.level + elapsed * self.rate)
+            self.updated = now
+
+    def available_at(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # A request larger than the bucket only waits for a full bucket
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return self.updated
+        return self.updated + (needed - self.level) / self.rate
+
+    def consume(self, amount: float, at: float) -> None:
+        self._refill(at)
+        self.level -= amount
+
+    def resize(self, capacity: float, rate: float, now: float) -> None:
+        self._refill(now)
+        self.capacity = capacity
+        self.rate = rate
+        self.level = min(self.level, capacity)
+
+
+def _bucket_sizes(
+    max_items: int | None, time_limit: float, tokens_per_minute: int | None
+) -> Dict[str, tuple[float, float] | None]:
+    """
+    Capacity and refill rate per second of the requests and tokens buckets
+
+    Returns:
+        Bucket sizes by kind, None for a kind without limit
+    """
+    return {
+        # The whole window budget may be spent in a burst
+        "requests": ((max_items, max_items / (time_limit * 60)) if max_items else None),
+        # Allow a burst of one minute worth of tokens
+        "tokens": (
+            (max(tokens_per_minute, 1), tokens_per_minute / 60)
+            if tokens_per_minute
+            else None
+        ),
+    }
+
+
+def _schedule(reservations: List[tuple[TokenBucket, float]], now: float) -> float:
+    start = max(
+        [now] + [bucket.available_at(amount, now) for bucket, amount in reservations]
+    )
+    for bucket, amount in reservations:
+        bucket.consume(amount, start)
+    return start
+
+
+class RateLimiter:
+    """
+    Requests per time window and tokens per minute budgets of a
+    provider/model, shared by every thread and task of the process. Callers
+    reserve their slot under a lock and then wait outside of it, so waiters
+    are served in arrival order.
+    """
+
+    _instances: Dict[tuple[str, str], "RateLimiter"] = {}
+    _instances_lock = Lock()
+
+    def __new__(
+        cls,
+        provider: str,
+        model: str,
+        max_items: int | None = None,
+        time_limit: float = 1,
+        tokens_per_minute: int | None = None,
+    ):
+        key = (provider, model)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                instance = super().__new__(cls)
+                instance.provider = provider
+                instance.model = model
+                instance._lock = Lock()
+                instance._initialize()
+                cls._instances[key] = instance
+            instance = cls._instances[key]
+            instance.configure(max_items, time_limit, tokens_per_minute)
+        return instance
+
+    def _initialize(self) -> None:
+        self._requests: TokenBucket | None = None
+        self._tokens: TokenBucket | None = None
+
+    def configure(
+        self,
+        max_items: int | None,
+        time_limit: float,
+        tokens_per_minute: int | None,
+    ) -> None:
+        sizes = _bucket_sizes(max_items, time_limit, tokens_per_minute)
+        with self._lock:
+            self._requests = _resize_bucket(self._requests, sizes["requests"])
+            self._tokens = _resize_bucket(self._tokens, sizes["tokens"])
+
+    def reserve(self, tokens: int = 0) -> float:
+        """
+        Reserve one request and `tokens` tokens
+
+        Returns:
+            Seconds to wait before sending the request
+        """
+        with self._lock:
+            now = monotonic()
+            reservations = [
+                (bucket, amount)
+                for bucket, amount in [(self._requests, 1), (self._tokens, tokens)]
+                if bucket is not None
+            ]
+            return _schedule(reservations, now) - now
+
+    def acquire(self, tokens: int = 0) -> float:
+        delay = self.reserve(tokens)
+        RATE_LIMIT_WAIT.observe(delay, provider=self.provider, model=self.model)
+        if delay > 0:
+            sleep(delay)
+        return delay
+
+    async def _areserve(self, tokens: int) -> float:
+        # In-memory reservations only hold a lock for a few operations
+        return self.reserve(tokens)
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        delay = await self._areserve(tokens)
+        RATE_LIMIT_WAIT.observe(delay, provider=self.provider, model=self.model)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+
+def _resize_bucket(
+    bucket: TokenBucket | None, size: tuple[float, float] | None
+) -> TokenBucket | None:
+    if size is None:
+        return None
+    capacity, rate = size
+    if bucket is None:
+        return TokenBucket(capacity, rate, updated=monotonic())
+    bucket.resize(capacity, rate, monotonic())
+    return bucket
+
+
+class SQLiteRateLimiter(RateLimiter):
+    """
+    Rate limiter whose buckets live in a SQLite file, so every process of a
+    host (API workers, CLI batches) draws from the same budget. Reservations
+    run in an immediate transaction: each caller is given the next free slot
+    and sleeps until then without polling, which keeps waiters in order.
+    """
+
+    _instances: Dict[tuple[str, str], "RateLimiter"] = {}
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS buckets (
+            name TEXT PRIMARY KEY,
+            capacity REAL NOT NULL,
+            rate REAL NOT NULL,
+            level REAL NOT NULL,
+            updated REAL NOT NULL
+        );
+    """
+
+    def _initialize(self) -> None:
+        self._path = Path(RATE_LIMIT_PATH)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = local()
+        self._limits: Dict[str, tuple[float, float] | None] = {}
+        self._connection().executescript(self._SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self._path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def configure(
+        self,
+        max_items: int | None,
+        time_limit: float,
+        tokens_per_minute: int | None,
+    ) -> None:
+        sizes = _bucket_sizes(max_items, time_limit, tokens_per_minute)
+        with self._lock:
+            self._limits = sizes
+
+    def _load_bucket(
+        self,
+        conn: sqlite3.Connection,
+        name: str,
+        size: tuple[float, float],
+        now: float,
+    ) -> TokenBucket:
+        capacity, rate = size
+        row = conn.execute(
+            "SELECT capacity, rate, level, updated FROM buckets WHERE name = ?",
+            [name],
+        ).fetchone()
+        if row is None:
+            return TokenBucket(capacity, rate, updated=now)
+
+        bucket = TokenBucket(*row)
+        if (bucket.capacity, bucket.rate) != (capacity, rate):
+            bucket.resize(capacity, rate, now)
+        return bucket
+
+    async def _areserve(self, tokens: int) -> float:
+        # A reservation may wait up to the busy timeout for the write lock,
+        # which must not stall every coroutine of the event loop
+        return await asyncio.to_thread(self.reserve, tokens)
+
+    def reserve(self, tokens: int = 0) -> float:
+        with self._lock:
+            limits = dict(self._limits)
+
+        amounts = {"requests": 1, "tokens": tokens}
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Wall clock time since monotonic clocks are not shared by processes
+            now = time()
+            buckets = {
+                kind: self._load_bucket(
+                    conn, f"{self.provider}/{self.model}/{kind}", size, now
+                )
+                for kind, size in limits.items()
+                if size is not None
+            }
+            start = _schedule(
+                [(bucket, amounts[kind]) for kind, bucket in buckets.items()], now
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO buckets (name, capacity, rate, level, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        f"{self.provider}/{self.model}/{kind}",
+                        bucket.capacity,
+                        bucket.rate,
+                        bucket.level,
+                        bucket.updated,
+                    )
+                    for kind, bucket in buckets.items()
+                ],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return start - now
+
+
+def get_rate_limiter(
+    provider: str,
+    model: str,
+    max_items: int | None = None,
+    time_limit: float = 1,
+    tokens_per_minute: int | None = None,
+) -> RateLimiter:
+    if RATE_LIMIT_BACKEND == "sqlite":
+        limiter_class = SQLiteRateLimiter
+    elif RATE_LIMIT_BACKEND == "memory":
+        limiter_class = RateLimiter
+    else:
+        raise ValueError(f"Unknown rate limit backend: {RATE_LIMIT_BACKEND}")
+    return limiter_class(provider, model, max_items, time_limit, tokens_per_minute)
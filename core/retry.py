@@ -0,0 +1,197 @@
+import asyncio
+from email.utils import parsedate_to_datetime
+import os
+import random
+import threading
+from datetime import datetime, timezone
+from time import monotonic, sleep
+from typing import Awaitable, Callable, TypeVar
+
+from dotenv import load_dotenv
+
+load_dotenv()
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 5))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", 1))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", 60))
+
+RATE_LIMIT_STATUSES = {429}
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+# Providers whose SDK errors carry no status code
+RATE_LIMIT_ERRORS = {"RateLimitError", "ResourceExhausted", "TooManyRequests"}
+RETRYABLE_ERRORS = RATE_LIMIT_ERRORS | {
+    "APIConnectionError",
+    "APITimeoutError",
+    "ConnectError",
+    "DeadlineExceeded",
+    "InternalServerError",
+    "OverloadedError",
+    "ReadTimeout",
+    "ServiceUnavailable",
+    "TimeoutError",
+}
+
+T = TypeVar("T")
+
+
+def _status_code(error: Exception) -> int | None:
+    for status in [
+        getattr(error, "status_code", None),
+        getattr(error, "code", None),
+        getattr(getattr(error, "response", None), "status_code", None),
+    ]:
+        if isinstance(status, int):
+            return status
+    return None
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return (
+        _status_code(error) in RATE_LIMIT_STATUSES
+        or type(error).__name__ in RATE_LIMIT_ERRORS
+    )
+
+
+def is_retryable(error: Exception) -> bool:
+    return (
+        _status_code(error) in RETRYABLE_STATUSES
+        or type(error).__name__ in RETRYABLE_ERRORS
+    )
+
+
+def retry_after(error: Exception) -> float | None:
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    if (value := headers.get("retry-after-ms")) is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    if (value := headers.get("retry-after")) is not None:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                retry_at = parsedate_to_datetime(value)
+            except (TypeError, ValueError):
+                return None
+            return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+    return None
+
+
+def backoff_delay(
+    attempt: int,
+    error: Exception | None = None,
+    base: float = LLM_RETRY_BASE_SECONDS,
+    cap: float = LLM_RETRY_MAX_SECONDS,
+) -> float:
+    # Full jitter spreads the retries of concurrent callers
+    delay = random.uniform(0, min(cap, base * 2**attempt))
+    if error is not None and (server_delay := retry_after(error)) is not None:
+        delay = server_delay + random.uniform(0, base)
+    return delay
+
+
+def retry_call(
+    fn: Callable[[], T],
+    max_retries: int = LLM_MAX_RETRIES,
+    on_retry: Callable[[Exception, int, float], None] | None = None,
+) -> T:
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, e)
+            attempt += 1
+            if on_retry:
+                on_retry(e, attempt, delay)
+            sleep(delay)
+
+
+async def aretry_call(
+    fn: Callable[[], Awaitable[T]],
+    max_retries: int = LLM_MAX_RETRIES,
+    on_retry: Callable[[Exception, int, float], None] | None = None,
+) -> T:
+    attempt = 0
+    while True:
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt, e)
+            attempt += 1
+            if on_retry:
+                on_retry(e, attempt, delay)
+            await asyncio.sleep(delay)
+
+
+class AdaptiveConcurrency:
+    """
+    AIMD concurrency limit: each success raises the limit by 1/limit (about
+    one more slot per round of calls) up to `max_limit`, each rate limit error
+    halves it, at most once per `cooldown` seconds since the calls already in
+    flight fail together. Used as `async with limiter:` around one call.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, cooldown: float = 1.0):
+        self.max_limit = max(max_limit, min_limit)
+        self.min_limit = min_limit
+        self.limit = float(self.max_limit)
+        self.in_flight = 0
+        self._cooldown = cooldown
+        self._last_decrease = float("-inf")
+        self._condition = self._new_condition()
+
+    def _new_condition(self) -> asyncio.Condition:
+        return asyncio.Condition()
+
+    def _has_slot(self) -> bool:
+        return self.in_flight < int(self.limit)
+
+    def _release(self, exc: BaseException | None) -> None:
+        # Called with the condition held
+        self.in_flight -= 1
+        if exc is None:
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+        elif isinstance(exc, Exception) and is_rate_limited(exc):
+            now = monotonic()
+            if now - self._last_decrease >= self._cooldown:
+                self._last_decrease = now
+                self.limit = max(self.min_limit, self.limit / 2)
+        self._condition.notify_all()
+
+    async def __aenter__(self) -> "AdaptiveConcurrency":
+        async with self._condition:
+            await self._condition.wait_for(self._has_slot)
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        async with self._condition:
+            self._release(exc)
+
+
+class ThreadAdaptiveConcurrency(AdaptiveConcurrency):
+    """
+    AIMD concurrency limit shared by threads, for blocking calls. Used as
+    `with limiter:` around one call.
+    """
+
+    def _new_condition(self) -> threading.Condition:
+        return threading.Condition()
+
+    def __enter__(self) -> "ThreadAdaptiveConcurrency":
+        with self._condition:
+            self._condition.wait_for(self._has_slot)
+            self.in_flight += 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        with self._condition:
+            self._release(exc)
@@ -1,27 +1,34 @@
+import asyncio
 import os
+from contextlib import nullcontext
+from concurrent.futures import Executor
+from functools import partial
 from pathlib import Path
 from cli.ui import CONSOLE
 from core.exceptions import ValidationError
+from core.metrics import STAGE_DURATION
 from core.model_factory import ModelFactory
+from core.pipeline import ExtractionPipeline
 from core.models import DataBaseModel
-from core.utils import write_csv, write_json
+from core.output import open_sink
+from core.tracing import bind, span
+from data_extractor.context_pruner import ContextPruner
 from data_extractor.data_extractor import DataExtractor
 from data_extractor.llm_extractor import LLMDataExtractor
-from text_extractor.text_extractor import TextExtractor
+from text_extractor.text_extractor import TextContent, TextExtractor
 from text_extractor.unstructured import Strategy, UnstructuredTextExtractor
-from core.queue_manager import QueueManager
-from time import sleep
 
 from web.models import ExtractorConfig
 
-
-queue_manager = None
+TEXT_EXTRACTORS: dict[str, type[TextExtractor]] = {
+    "unstructured": UnstructuredTextExtractor,
+}
 
 
 def _get_text_extractor(text_extractor: str) -> type[TextExtractor]:
-    if text_extractor == "unstructured":
-        return UnstructuredTextExtractor
-    raise ValueError(f"Unknown text extractor: {text_extractor}")
+    if text_extractor not in TEXT_EXTRACTORS:
+        raise ValueError(f"Unknown text extractor: {text_extractor}")
+    return TEXT_EXTRACTORS[text_extractor]
 
 
 def extract_text(
@@ -30,10 +37,19 @@ def extract_text(
     strategy: Strategy,
     no_cache: bool,
     text_extractor: str,
-) -> str:
+    content_hash: str | None = None,
+    page_workers: int = 1,
+    no_text_layer: bool = False,
+) -> TextContent:
     extractor_class = _get_text_extractor(text_extractor)
-    extractor = extractor_class(languages, not no_cache, strategy)
-    return extractor.get_text_content(file_path)
+    extractor = extractor_class(
+        languages, not no_cache, strategy, page_workers, not no_text_layer
+    )
+    with span("extract_text", {"file.name": Path(file_path).name}):
+        return TextContent(
+            extractor.get_text_content(file_path, content_hash),
+            extractor.get_page_sources(file_path, content_hash),
+        )
 
 
 def _get_data_extractor(data_extractor: str) -> type[DataExtractor]:
@@ -42,15 +58,68 @@ def _get_data_extractor(data_extractor: str) -> type[DataExtractor]:
     raise ValueError(f"Unknown data extractor: {data_extractor}")
 
 
+def _prune_context(
+    text_content: str,
+    output_schema: type[DataBaseModel],
+    prune_top_k: int,
+    prune_token_budget: int,
+) -> str:
+    pruned = ContextPruner(prune_top_k, prune_token_budget).prune(
+        text_content, output_schema
+    )
+    CONSOLE.print(
+        f"[dim]Context pruning kept {pruned.pruned_tokens} of {pruned.original_tokens} "
+        f"input tokens ({pruned.saved_tokens} saved)[/dim]"
+    )
+    return pruned.text
+
+
 def extract_data(
     text_content: str,
     output_schema: type[DataBaseModel],
     data_extractor: str,
+    prune_context: bool = False,
+    prune_top_k: int = 3,
+    prune_token_budget: int = 4000,
     **kwargs,
 ) -> DataBaseModel:
+    if prune_context:
+        text_content = _prune_context(
+            text_content, output_schema, prune_top_k, prune_token_budget
+        )
+
     extractor_class = _get_data_extractor(data_extractor)
     extractor = extractor_class(**kwargs)
-    return extractor.extract(text_content, output_schema)
+    with span("extract_data"), STAGE_DURATION.time(stage="extract_data"):
+        return extractor.extract(text_content, output_schema)
+
+
+async def aextract_data(
+    text_content: str,
+    output_schema: type[DataBaseModel],
+    data_extractor: str,
+    prune_context: bool = False,
+    prune_top_k: int = 3,
+    prune_token_budget: int = 4000,
+    **kwargs,
+) -> DataBaseModel:
+    # Only the LLM calls run on the event loop: pruning is CPU-bound and
+    # building an extractor opens caches and may initialize a client
+    if prune_context:
+        text_content = await asyncio.to_thread(
+            _prune_context, text_content, output_schema, prune_top_k, prune_token_budget
+        )
+
+    extractor_class = _get_data_extractor(data_extractor)
+    extractor = await asyncio.to_thread(extractor_class, **kwargs)
+    with span("extract_data"), STAGE_DURATION.time(stage="extract_data"):
+        return await extractor.aextract(text_content, output_schema)
+
+
+def _write_output(output: str, extracted_data: DataBaseModel) -> None:
+    with span("write_output"), STAGE_DURATION.time(stage="write_output"):
+        with open_sink(output) as sink:
+            sink.write(extracted_data)
 
 
 def extract(
@@ -62,33 +131,81 @@ def extract(
     output_schema: type[DataBaseModel],
     data_extractor: str,
     output: str | None = None,
+    text_executor: Executor | None = None,
+    content_hash: str | None = None,
+    page_workers: int = 1,
+    no_text_layer: bool = False,
     **kwargs,
 ) -> str | DataBaseModel | ValidationError:
-    global queue_manager
-    queue_manager = QueueManager(kwargs["max_items"], kwargs["time_limit"])
+    try:
+        text_args = (
+            file_path,
+            languages,
+            strategy,
+            no_cache,
+            text_extractor,
+            content_hash,
+            page_workers,
+            no_text_layer,
+        )
+        with STAGE_DURATION.time(stage="extract_text"):
+            if text_executor is not None:
+                text_content = text_executor.submit(
+                    bind(extract_text), *text_args
+                ).result()
+            else:
+                text_content = extract_text(*text_args)
 
-    while not queue_manager.can_process():
-        CONSOLE.print(
-            f"Limit per minute is reached. Waiting for {queue_manager.time_limit} minutes..."
+        extracted_data = extract_data(
+            text_content.text, output_schema, data_extractor, **kwargs
         )
-        sleep(queue_manager.time_limit * 60)
+        extracted_data.page_sources = text_content.page_sources
+
+        if output is not None:
+            _write_output(output, extracted_data)
+
+        return extracted_data
+    except Exception as e:
+        return ValidationError(file_path, str(e))
 
-    queue_manager.increment_processed()
 
+async def aextract(
+    file_path: Path,
+    languages: list[str],
+    strategy: Strategy,
+    no_cache: bool,
+    text_extractor: str,
+    output_schema: type[DataBaseModel],
+    data_extractor: str,
+    output: str | None = None,
+    text_executor: Executor | None = None,
+    content_hash: str | None = None,
+    page_workers: int = 1,
+    no_text_layer: bool = False,
+    **kwargs,
+) -> str | DataBaseModel | ValidationError:
     try:
-        text_content = extract_text(
-            file_path, languages, strategy, no_cache, text_extractor
-        )
-        extracted_data = extract_data(
-            text_content, output_schema, data_extractor, **kwargs
+        with STAGE_DURATION.time(stage="extract_text"):
+            text_content = await asyncio.get_running_loop().run_in_executor(
+                text_executor,
+                bind(extract_text),
+                file_path,
+                languages,
+                strategy,
+                no_cache,
+                text_extractor,
+                content_hash,
+                page_workers,
+                no_text_layer,
+            )
+
+        extracted_data = await aextract_data(
+            text_content.text, output_schema, data_extractor, **kwargs
         )
+        extracted_data.page_sources = text_content.page_sources
 
         if output is not None:
-            extension = output.split(".")[-1]
-            if extension == "csv":
-                write_csv(Path(output), extracted_data.model_dump_csv())
-            elif extension == "json":
-                write_json(Path(output), extracted_data.model_dump())
+            await asyncio.to_thread(_write_output, output, extracted_data)
 
         return extracted_data
     except Exception as e:
@@ -105,39 +222,98 @@ def extract_list(
     data_extractor: str = "llm",
     output: str | None = None,
     progress=None,
+    workers: int = 1,
+    concurrency: int = 1,
+    queue_size: int | None = None,
+    page_workers: int = 1,
+    no_text_layer: bool = False,
     **kwargs,
 ) -> tuple[list[str | DataBaseModel], list[ValidationError]]:
-    results = []
-    errors = []
-
     total_files = len(files_path)
     task_id = None
     if progress:
         task_id = progress.add_task("Processing files...", total=total_files)
 
-    for file_path in files_path:
-        if progress:
-            progress.update(task_id, description=f"Processing {file_path.name}")
+    outcomes: list[DataBaseModel | ValidationError | None] = [None] * total_files
+    written = 0
 
-        result = extract(
-            file_path,
-            languages,
-            strategy,
-            no_cache,
-            text_extractor,
-            output_schema,
-            data_extractor,
-            output,
-            **kwargs,
-        )
-        if isinstance(result, ValidationError):
-            errors.append(result)
-        else:
-            results.append(result)
+    def collect(index: int, result: DataBaseModel | ValidationError) -> None:
+        nonlocal written
+        outcomes[index] = result
+
+        # Flush outputs in input order as soon as the next result is available
+        while written < total_files and outcomes[written] is not None:
+            if sink is not None and not isinstance(outcomes[written], ValidationError):
+                attributes = {
+                    "job.id": str(written),
+                    "file.name": files_path[written].name,
+                }
+                with span("write_output", attributes):
+                    sink.write(outcomes[written])
+            written += 1
 
         if progress:
             progress.advance(task_id)
 
+    sink = open_sink(output) if output is not None else None
+    with sink or nullcontext():
+        if total_files <= 1:
+            for index, file_path in enumerate(files_path):
+                if progress:
+                    progress.update(task_id, description=f"Processing {file_path.name}")
+                attributes = {"job.id": str(index), "file.name": file_path.name}
+                with span("document", attributes) as document:
+                    result = extract(
+                        file_path,
+                        languages,
+                        strategy,
+                        no_cache,
+                        text_extractor,
+                        output_schema,
+                        data_extractor,
+                        page_workers=page_workers,
+                        no_text_layer=no_text_layer,
+                        **kwargs,
+                    )
+                    if isinstance(result, ValidationError):
+                        document.record_error(result.reason)
+                collect(index, result)
+        else:
+            pipeline = ExtractionPipeline(
+                text_fn=partial(
+                    extract_text,
+                    languages=languages,
+                    strategy=strategy,
+                    no_cache=no_cache,
+                    text_extractor=text_extractor,
+                    page_workers=page_workers,
+                    no_text_layer=no_text_layer,
+                ),
+                data_fn=partial(
+                    aextract_data,
+                    output_schema=output_schema,
+                    data_extractor=data_extractor,
+                    **kwargs,
+                ),
+                workers=workers,
+                concurrency=concurrency,
+                queue_size=queue_size,
+            )
+
+            def show_status() -> None:
+                if progress:
+                    progress.update(
+                        task_id, description=f"Processing files ({pipeline.status()})"
+                    )
+
+            def collect_with_status(index: int, result) -> None:
+                collect(index, result)
+                show_status()
+
+            pipeline.run(files_path, collect_with_status, show_status)
+
+    results = [r for r in outcomes if not isinstance(r, ValidationError)]
+    errors = [r for r in outcomes if isinstance(r, ValidationError)]
     return results, errors
 
 
@@ -166,32 +342,72 @@ def extract_from_config_file(
     )
 
 
+def _config_kwargs(config: ExtractorConfig) -> dict:
+    return {
+        "languages": config.languages,
+        "strategy": config.strategy,  # Remove Strategy() conversion since it's already an enum
+        "no_cache": config.no_cache,
+        "text_extractor": config.text_extractor,
+        "data_extractor": config.data_extractor,
+        "page_workers": int(os.getenv("OCR_PAGE_WORKERS", "1")),
+        "no_text_layer": config.no_text_layer,
+        "llm_model": config.llm_model,
+        "llm_provider": config.llm_provider,
+        "llm_temperature": config.llm_temperature,
+        "no_llm_cache": config.no_llm_cache,
+        "chunk_size": config.chunk_size,
+        "chunk_overlap": config.chunk_overlap,
+        "chunk_concurrency": config.chunk_concurrency,
+        "prune_context": config.prune_context,
+        "prune_top_k": config.prune_top_k,
+        "prune_token_budget": config.prune_token_budget,
+        "examples": config.examples,
+        "max_items": int(os.getenv("QUEUE_MAX_ITEMS", "60")),
+        "time_limit": int(os.getenv("QUEUE_TIME_LIMIT_MINUTES", "1")),
+        "max_tokens_per_minute": int(os.getenv("QUEUE_MAX_TOKENS_PER_MINUTE", "0"))
+        or None,
+    }
+
+
 def extract_from_config(
     file_path: Path,
     config: ExtractorConfig,
+    text_executor: Executor | None = None,
+    content_hash: str | None = None,
 ) -> DataBaseModel | ValidationError:
     try:
         output_schema = ModelFactory.load_model_json(config.output_schema)
 
-        kwargs = {
-            "llm_model": config.llm_model,
-            "llm_provider": config.llm_provider,
-            "llm_temperature": config.llm_temperature,
-            "examples": config.examples,
-            "max_items": int(os.getenv("QUEUE_MAX_ITEMS", "60")),
-            "time_limit": int(os.getenv("QUEUE_TIME_LIMIT_MINUTES", "1")),
-        }
-
         return extract(
             file_path=file_path,
-            languages=config.languages,
-            strategy=config.strategy,  # Remove Strategy() conversion since it's already an enum
-            no_cache=config.no_cache,
-            text_extractor=config.text_extractor,
             output_schema=output_schema,
-            data_extractor=config.data_extractor,
             output=None,
-            **kwargs,
+            text_executor=text_executor,
+            content_hash=content_hash,
+            **_config_kwargs(config),
+        )
+    except Exception as e:
+        return ValidationError(file_path, str(e))
+
+
+async def aextract_from_config(
+    file_path: Path,
+    config: ExtractorConfig,
+    text_executor: Executor | None = None,
+    content_hash: str | None = None,
+) -> DataBaseModel | ValidationError:
+    try:
+        output_schema = await asyncio.to_thread(
+            ModelFactory.load_model_json, config.output_schema
+        )
+
+        return await aextract(
+            file_path=file_path,
+            output_schema=output_schema,
+            output=None,
+            text_executor=text_executor,
+            content_hash=content_hash,
+            **_config_kwargs(config),
         )
     except Exception as e:
         return ValidationError(file_path, str(e))
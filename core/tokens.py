@@ -0,0 +1,11 @@
+import re
+
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+CHARS_PER_TOKEN = 4
+
+
+def count_tokens(text: str) -> int:
+    # Local approximation of sub-word tokenizers: long words count as several tokens
+    return sum(
+        -(-len(piece) // CHARS_PER_TOKEN) for piece in TOKEN_PATTERN.findall(text)
+    )
@@ -0,0 +1,320 @@
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+import json
+import os
+from pathlib import Path
+import secrets
+from threading import get_native_id
+from time import time_ns
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple
+
+from dotenv import load_dotenv
+
+from cli.ui import CONSOLE
+from core.utils import FILE_ENCODING, ensure_dir_exists
+
+load_dotenv()
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "none")
+TRACE_PATH = os.getenv("TRACE_PATH", "./tmp/traces.jsonl")
+
+SERVICE_NAME = "extrix"
+# Attributes passed down to every child span of a document
+INHERITED_ATTRIBUTES = ("job.id", "file.name")
+
+
+class SpanContext(NamedTuple):
+    trace_id: str
+    span_id: str
+    attributes: Dict[str, Any]
+
+
+_current_context: ContextVar[SpanContext | None] = ContextVar(
+    "current_span_context", default=None
+)
+
+
+class Span:
+    """
+    Timed operation following the OpenTelemetry span model: spans of a
+    document share its trace id and point to their parent span, and inherit
+    the job id and file name of their parent.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        attributes: Dict[str, Any] | None = None,
+        parent: SpanContext | None = None,
+    ):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.attributes = {
+            **(parent.attributes if parent else {}),
+            **(attributes or {}),
+        }
+        self.start_time = time_ns()
+        self.end_time: int | None = None
+        self.status = "OK"
+        self.status_message: str | None = None
+        self.thread_id = get_native_id()
+
+    def context(self) -> SpanContext:
+        inherited = {
+            key: value
+            for key, value in self.attributes.items()
+            if key in INHERITED_ATTRIBUTES
+        }
+        return SpanContext(self.trace_id, self.span_id, inherited)
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException | str) -> None:
+        self.status = "ERROR"
+        self.status_message = str(error)
+
+    def end(self) -> None:
+        if self.end_time is None:
+            self.end_time = time_ns()
+            _get_exporter().export(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "name": self.name,
+            "start_time_unix_nano": self.start_time,
+            "end_time_unix_nano": self.end_time,
+            "attributes": self.attributes,
+            "status": {"code": self.status, "message": self.status_message},
+            "resource": {"service.name": SERVICE_NAME, "process.pid": os.getpid()},
+            "thread_id": self.thread_id,
+        }
+
+
+class _NoopSpan(Span):
+    def __init__(self):
+        self.attributes = {}
+
+    def context(self) -> None:
+        return None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, error: BaseException | str) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class SpanExporter(ABC):
+    @abstractmethod
+    def export(self, span: Span) -> None:
+        pass
+
+
+class NoopSpanExporter(SpanExporter):
+    def export(self, span: Span) -> None:
+        pass
+
+
+class ConsoleSpanExporter(SpanExporter):
+    def export(self, span: Span) -> None:
+        duration = (span.end_time - span.start_time) / 1e9
+        attributes = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+        status = "" if span.status == "OK" else f" [red]{span.status_message}[/red]"
+        CONSOLE.print(
+            f"[dim]trace {span.name} {duration:.3f}s {attributes}[/dim]{status}"
+        )
+
+
+class FileSpanExporter(SpanExporter):
+    """
+    Appends one JSON line per span. Each span is a single O_APPEND write, so
+    the worker processes of a batch can share the file.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def export(self, span: Span) -> None:
+        content = json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n"
+        ensure_dir_exists(self.path)
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, content.encode(FILE_ENCODING))
+        finally:
+            os.close(fd)
+
+
+EXPORTERS: Dict[str, Callable[[], SpanExporter]] = {
+    "none": NoopSpanExporter,
+    "console": ConsoleSpanExporter,
+    "file": lambda: FileSpanExporter(TRACE_PATH),
+}
+
+_exporter: SpanExporter | None = None
+
+
+def _get_exporter() -> SpanExporter:
+    global _exporter
+    if _exporter is None:
+        if TRACE_EXPORTER not in EXPORTERS:
+            raise ValueError(f"Unknown trace exporter: {TRACE_EXPORTER}")
+        _exporter = EXPORTERS[TRACE_EXPORTER]()
+    return _exporter
+
+
+def configure_tracing(exporter: str, path: str | None = None) -> None:
+    """
+    Select the span exporter of this process. The environment is updated as
+    well so that worker processes started afterwards export their spans too.
+    """
+    global TRACE_EXPORTER, TRACE_PATH, _exporter
+    if exporter not in EXPORTERS:
+        raise ValueError(f"Unknown trace exporter: {exporter}")
+    TRACE_EXPORTER = os.environ["TRACE_EXPORTER"] = exporter
+    if path is not None:
+        TRACE_PATH = os.environ["TRACE_PATH"] = path
+    _exporter = None
+
+
+def tracing_enabled() -> bool:
+    return TRACE_EXPORTER != "none"
+
+
+def current_context() -> SpanContext | None:
+    return _current_context.get()
+
+
+def start_span(
+    name: str,
+    attributes: Dict[str, Any] | None = None,
+    parent: SpanContext | None = None,
+) -> Span:
+    """
+    Start a span to be ended explicitly, for operations spanning threads
+
+    Returns:
+        The started span, a no-op span when tracing is disabled
+    """
+    if not tracing_enabled():
+        return NOOP_SPAN
+    return Span(name, attributes, parent or current_context())
+
+
+@contextmanager
+def use_context(context: SpanContext | None) -> Iterator[None]:
+    token = _current_context.set(context)
+    try:
+        yield
+    finally:
+        _current_context.reset(token)
+
+
+@contextmanager
+def span(name: str, attributes: Dict[str, Any] | None = None) -> Iterator[Span]:
+    current = start_span(name, attributes)
+    try:
+        with use_context(current.context()):
+            yield current
+    except BaseException as e:
+        current.record_error(e)
+        raise
+    finally:
+        current.end()
+
+
+def _call_in_context(context: SpanContext | None, fn: Callable, *args, **kwargs):
+    with use_context(context):
+        return fn(*args, **kwargs)
+
+
+def bind(fn: Callable, context: SpanContext | None = None) -> Callable:
+    """
+    Attach a span context to a function run in another thread or process,
+    where the current context is not propagated
+
+    Returns:
+        A picklable callable running `fn` under the context
+    """
+    context = context or current_context()
+    if context is None:
+        return fn
+    return partial(_call_in_context, context, fn)
+
+
+def load_spans(
+    path: str | None = None, trace_ids: set[str] | None = None
+) -> List[dict]:
+    spans = []
+    with open(path or TRACE_PATH, encoding=FILE_ENCODING) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            span = json.loads(line)
+            if trace_ids is None or span["trace_id"] in trace_ids:
+                spans.append(span)
+    return spans
+
+
+def write_timeline(spans: List[dict], output: Path) -> None:
+    """
+    Write spans in the Chrome trace event format, which chrome://tracing,
+    Perfetto and speedscope display as a timeline. Each job gets its own
+    track so that its spans stack into a flame graph.
+    """
+    start = min((span["start_time_unix_nano"] for span in spans), default=0)
+    lanes: Dict[str, int] = {}
+    events = []
+    for span in sorted(spans, key=lambda span: span["start_time_unix_nano"]):
+        attributes = span["attributes"]
+        lane_name = (
+            f"job {attributes['job.id']} · {attributes.get('file.name', '')}"
+            if "job.id" in attributes
+            else "batch"
+        )
+        if lane_name not in lanes:
+            lanes[lane_name] = len(lanes)
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": 1,
+                    "tid": lanes[lane_name],
+                    "args": {"name": lane_name},
+                }
+            )
+        events.append(
+            {
+                "name": span["name"],
+                "cat": SERVICE_NAME,
+                "ph": "X",
+                "ts": (span["start_time_unix_nano"] - start) / 1000,
+                "dur": (span["end_time_unix_nano"] - span["start_time_unix_nano"])
+                / 1000,
+                "pid": 1,
+                "tid": lanes[lane_name],
+                "args": {
+                    **attributes,
+                    "status": span["status"]["code"],
+                    "process.pid": span["resource"]["process.pid"],
+                },
+            }
+        )
+
+    ensure_dir_exists(output)
+    output.write_text(
+        json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}),
+        encoding=FILE_ENCODING,
+    )
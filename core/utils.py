@@ -1,17 +1,19 @@
 import json
-import csv
+import hashlib
 from pathlib import Path
 from typing import Any, Dict, List, Type
-from io import StringIO
 import fnmatch
 import os
-from pdf2image import convert_from_path
+from pdf2image import pdfinfo_from_path
+from pypdf import PdfReader, PdfWriter
 import tempfile
 import importlib
 import pkgutil
 
 JSON_IDENTATION = 2
 FILE_ENCODING = "utf-8"
+HASH_CHUNK_SIZE = 1024 * 1024
+DEFAULT_CHUNK_OVERLAP = 200
 
 
 def load_json_file(file_path: Path) -> Dict[str, Any]:
@@ -20,6 +22,18 @@ def load_json_file(file_path: Path) -> Dict[str, Any]:
     return data
 
 
+def new_hasher() -> "hashlib.blake2b":
+    return hashlib.blake2b(digest_size=32)
+
+
+def file_hash(path: Path, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    digest = new_hasher()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def ensure_dir_exists(path: Path) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
@@ -42,34 +56,38 @@ def load_json_array(path: Path) -> List[Dict[str, Any]]:
         return data if isinstance(data, list) else [data]
 
 
-def write_json(path: Path, data: Dict[str, Any]) -> None:
-    if path.exists():
-        existing_data = load_json_array(path)
-        existing_data.append(data)
-        content = json.dumps(existing_data, indent=JSON_IDENTATION, ensure_ascii=False)
-    else:
-        content = json.dumps([data], indent=JSON_IDENTATION, ensure_ascii=False)
-    write_file(path, content)
+def get_pdf_page_count(path: Path) -> int:
+    return int(pdfinfo_from_path(str(path))["Pages"])
 
 
-def write_csv_headers(path: Path, headers: List[str]) -> None:
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(headers)
-    write_file(path, output.getvalue())
+def extract_pdf_text_layer(path: Path) -> List[str]:
+    pages = []
+    for page in PdfReader(path).pages:
+        try:
+            pages.append(page.extract_text() or "")
+        except Exception:
+            # A page with a malformed content stream is left to OCR
+            pages.append("")
+    return pages
 
 
-def append_csv_row(path: Path, row: List[str]) -> None:
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(row)
-    append_file(path, output.getvalue())
+def write_pdf_pages(path: Path, first_page: int, last_page: int, output: Path) -> None:
+    reader = PdfReader(path)
+    writer = PdfWriter()
+    for page_index in range(first_page - 1, last_page):
+        writer.add_page(reader.pages[page_index])
+    with open(output, "wb") as f:
+        writer.write(f)
 
 
-def write_csv(path: Path, data: Dict[str, str]) -> None:
-    if not path.exists():
-        write_csv_headers(path, list(data.keys()))
-    append_csv_row(path, list(data.values()))
+def group_page_ranges(pages: List[int], max_size: int) -> List[tuple[int, int]]:
+    ranges: List[tuple[int, int]] = []
+    for page in sorted(pages):
+        if ranges and ranges[-1][1] == page - 1 and page - ranges[-1][0] < max_size:
+            ranges[-1] = (ranges[-1][0], page)
+        else:
+            ranges.append((page, page))
+    return ranges
 
 
 def find_files(pattern: str) -> List[Path]:
@@ -97,38 +115,31 @@ def update_monitoring_entry(
         "total_tokens",
         "duration_seconds",
         "estimated_cost_usd",
+        "cache_hits",
     ]:
-        existing_entry[key] += new_data[key]
+        existing_entry[key] = existing_entry.get(key, 0) + new_data[key]
     existing_entry["timestamp"] = new_data["timestamp"]
-
-
-def find_monitoring_entry(
-    data: List[Dict[str, Any]], model: str, provider: str
-) -> Dict[str, Any] | None:
-    return next(
-        (
-            entry
-            for entry in data
-            if entry["model"] == model and entry["provider"] == provider
-        ),
-        None,
-    )
-
-
-def write_monitoring_data(path: Path, new_data: Dict[str, Any]) -> None:
-    if path.exists():
-        existing_data = load_json_array(path)
-        entry = find_monitoring_entry(
-            existing_data, new_data["model"], new_data["provider"]
+    if new_data.get("structured_output") is not None:
+        existing_entry["structured_output"] = new_data["structured_output"]
+
+
+def resolve_chunk_overlap(chunk_size: int | None, chunk_overlap: int | None) -> int:
+    """
+    Check the chunking options. Without an explicit overlap, the default one
+    is capped to a quarter of the chunk size so that small chunks stay valid
+
+    Returns:
+        Number of tokens shared by consecutive chunks
+    """
+    if chunk_size is None:
+        return DEFAULT_CHUNK_OVERLAP if chunk_overlap is None else chunk_overlap
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size must be positive, got {chunk_size}")
+    if chunk_overlap is None:
+        return min(DEFAULT_CHUNK_OVERLAP, chunk_size // 4)
+    if not 0 <= chunk_overlap < chunk_size:
+        raise ValueError(
+            f"Chunk overlap ({chunk_overlap}) must be between 0 and the chunk size "
+            f"({chunk_size}) excluded"
         )
-
-        if entry:
-            update_monitoring_entry(entry, new_data)
-            content = json.dumps(
-                existing_data, indent=JSON_IDENTATION, ensure_ascii=False
-            )
-            write_file(path, content)
-        else:
-            write_json(path, new_data)
-    else:
-        write_json(path, new_data)
+    return chunk_overlap
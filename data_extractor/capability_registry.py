@@ -0,0 +1,102 @@
+import json
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+from threading import Lock
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+
+from core.utils import ensure_dir_exists, load_json_file
+
+load_dotenv()
+CAPABILITY_REGISTRY_PATH = os.getenv(
+    "CAPABILITY_REGISTRY_PATH", "./tmp/capabilities.json"
+)
+CAPABILITY_REPROBE_HOURS = float(os.getenv("CAPABILITY_REPROBE_HOURS", 24))
+
+
+class CapabilityRegistry:
+    """
+    Structured output support per model, shared by processes through a JSON
+    file. The file is read again whenever another process changed it, and
+    the most recent probe of a model wins.
+    """
+
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._path = Path(CAPABILITY_REGISTRY_PATH)
+                    cls._instance._reprobe_after = timedelta(
+                        hours=CAPABILITY_REPROBE_HOURS
+                    )
+                    cls._instance._entries = {}
+                    cls._instance._mtime_ns = None
+                    cls._instance._refresh()
+        return cls._instance
+
+    @staticmethod
+    def _key(provider: str, model: str) -> str:
+        return f"{provider}/{model}"
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self._path.exists():
+            return {}
+        try:
+            return load_json_file(self._path)
+        except json.JSONDecodeError:
+            return {}
+
+    def _merge(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        # ISO timestamps of the same format compare in chronological order
+        for key, entry in entries.items():
+            current = self._entries.get(key)
+            if current is None or entry["checked_at"] > current["checked_at"]:
+                self._entries[key] = entry
+
+    def _refresh(self) -> None:
+        try:
+            mtime_ns = self._path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime_ns != self._mtime_ns:
+            self._mtime_ns = mtime_ns
+            self._merge(self._load())
+
+    def supports_structured_output(self, provider: str, model: str) -> bool | None:
+        """
+        Returns:
+            The recorded capability, or None when it is unknown or due for
+            a new probe
+        """
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(self._key(provider, model))
+        if entry is None:
+            return None
+
+        checked_at = datetime.fromisoformat(entry["checked_at"])
+        if datetime.now() - checked_at >= self._reprobe_after:
+            return None
+        return entry["structured_output"]
+
+    def record(self, provider: str, model: str, structured_output: bool) -> None:
+        with self._lock:
+            # Merge with the file so newer probes of other processes are kept
+            self._merge(self._load())
+            self._entries[self._key(provider, model)] = {
+                "structured_output": structured_output,
+                "checked_at": datetime.now().isoformat(),
+            }
+
+            ensure_dir_exists(self._path)
+            tmp_path = self._path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_path, self._path)
+            self._mtime_ns = self._path.stat().st_mtime_ns
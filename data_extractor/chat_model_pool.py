@@ -0,0 +1,60 @@
+from threading import Lock
+from time import perf_counter
+from typing import Any, Dict, Tuple
+
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models import BaseChatModel
+
+
+class ChatModelPool:
+    _instance = None
+    _lock = Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super().__new__(cls)
+                    cls._instance._initialize()
+        return cls._instance
+
+    def _initialize(self):
+        self._models: Dict[Tuple[str, str, float], BaseChatModel] = {}
+        self._setup_seconds: Dict[Tuple[str, str, float], float] = {}
+        self._key_locks: Dict[Tuple[str, str, float], Lock] = {}
+        self._hits = 0
+        self._misses = 0
+        self._avoided_setup_seconds = 0.0
+
+    def get(self, provider: str, model: str, temperature: float) -> BaseChatModel:
+        key = (provider, model, temperature)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, Lock())
+
+        # Clients of other models can be created while this one initializes
+        with key_lock:
+            if key in self._models:
+                with self._lock:
+                    self._hits += 1
+                    self._avoided_setup_seconds += self._setup_seconds[key]
+                return self._models[key]
+
+            start = perf_counter()
+            llm = init_chat_model(
+                model=model, model_provider=provider, temperature=temperature
+            )
+            with self._lock:
+                self._misses += 1
+                self._setup_seconds[key] = perf_counter() - start
+                self._models[key] = llm
+            return llm
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "clients": len(self._models),
+                "hits": self._hits,
+                "misses": self._misses,
+                "setup_seconds": sum(self._setup_seconds.values()),
+                "avoided_setup_seconds": self._avoided_setup_seconds,
+            }
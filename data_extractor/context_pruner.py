@@ -0,0 +1,190 @@
+import math
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, List, NamedTuple, Type
+
+from pydantic import BaseModel
+
+from core.models import DataBaseModel
+from core.tokens import count_tokens
+
+WORD_PATTERN = re.compile(r"\w+")
+STOP_WORDS = {
+    "a",
+    "au",
+    "aux",
+    "ce",
+    "ces",
+    "d",
+    "dans",
+    "de",
+    "des",
+    "du",
+    "en",
+    "est",
+    "et",
+    "il",
+    "l",
+    "la",
+    "le",
+    "les",
+    "ou",
+    "par",
+    "pas",
+    "pour",
+    "qu",
+    "que",
+    "qui",
+    "s",
+    "sa",
+    "se",
+    "ses",
+    "son",
+    "sur",
+    "un",
+    "une",
+    "an",
+    "and",
+    "for",
+    "in",
+    "is",
+    "of",
+    "on",
+    "or",
+    "the",
+    "to",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    folded = unicodedata.normalize("NFKD", text.casefold())
+    folded = "".join(char for char in folded if not unicodedata.combining(char))
+    return [word for word in WORD_PATTERN.findall(folded) if word not in STOP_WORDS]
+
+
+class BM25Index:
+    def __init__(self, documents: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self._k1 = k1
+        self._b = b
+        self._term_frequencies = [Counter(document) for document in documents]
+        self._lengths = [len(document) for document in documents]
+        self._average_length = (
+            sum(self._lengths) / len(self._lengths) if self._lengths else 0
+        )
+
+        document_frequencies = Counter(
+            term for frequencies in self._term_frequencies for term in frequencies
+        )
+        total = len(documents)
+        self._idf = {
+            term: math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+            for term, frequency in document_frequencies.items()
+        }
+
+    def scores(self, query: List[str]) -> List[float]:
+        scores = []
+        for frequencies, length in zip(self._term_frequencies, self._lengths):
+            score = 0.0
+            norm = self._k1 * (
+                1 - self._b + self._b * length / (self._average_length or 1)
+            )
+            for term in set(query):
+                frequency = frequencies.get(term, 0)
+                if frequency:
+                    score += (
+                        self._idf[term]
+                        * frequency
+                        * (self._k1 + 1)
+                        / (frequency + norm)
+                    )
+            scores.append(score)
+        return scores
+
+
+class PrunedContext(NamedTuple):
+    text: str
+    original_tokens: int
+    pruned_tokens: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.pruned_tokens
+
+
+class ContextPruner:
+    def __init__(
+        self, top_k: int = 3, token_budget: int = 4000, passage_tokens: int = 150
+    ):
+        self._top_k = top_k
+        self._token_budget = token_budget
+        self._passage_tokens = passage_tokens
+
+    def _split_passages(self, text: str) -> List[str]:
+        passages: List[str] = []
+        current: List[str] = []
+        current_tokens = 0
+
+        for line in text.splitlines():
+            if not line.strip():
+                continue
+            line_tokens = count_tokens(line)
+            if current and current_tokens + line_tokens > self._passage_tokens:
+                passages.append("\n".join(current))
+                current, current_tokens = [], 0
+            current.append(line)
+            current_tokens += line_tokens
+
+        if current:
+            passages.append("\n".join(current))
+        return passages
+
+    @staticmethod
+    def _field_queries(output_schema: Type[BaseModel]) -> Dict[str, List[str]]:
+        queries = {}
+        for name, field in output_schema.model_fields.items():
+            query = " ".join(
+                part
+                for part in [name.replace("_", " "), field.title, field.description]
+                if part
+            )
+            annotation = field.annotation
+            if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+                query += " " + " ".join(
+                    part
+                    for nested in annotation.model_fields.values()
+                    for part in [nested.title, nested.description]
+                    if part
+                )
+            queries[name] = tokenize(query)
+        return queries
+
+    def prune(self, text: str, output_schema: Type[DataBaseModel]) -> PrunedContext:
+        original_tokens = count_tokens(text)
+        passages = self._split_passages(text)
+        index = BM25Index([tokenize(passage) for passage in passages])
+
+        rankings = []
+        for query in self._field_queries(output_schema).values():
+            scores = index.scores(query)
+            ranked = sorted(range(len(passages)), key=lambda i: scores[i], reverse=True)
+            rankings.append([i for i in ranked[: self._top_k] if scores[i] > 0])
+
+        # Take every field's best passage first, then their second best, and
+        # so on, so the budget is shared fairly between fields
+        selected: set[int] = set()
+        used_tokens = 0
+        for rank in range(self._top_k):
+            for ranking in rankings:
+                if rank >= len(ranking) or ranking[rank] in selected:
+                    continue
+                passage_tokens = count_tokens(passages[ranking[rank]])
+                if used_tokens + passage_tokens <= self._token_budget:
+                    selected.add(ranking[rank])
+                    used_tokens += passage_tokens
+
+        if not selected:
+            return PrunedContext(text, original_tokens, original_tokens)
+
+        pruned_text = "\n".join(passages[i] for i in sorted(selected))
+        return PrunedContext(pruned_text, original_tokens, count_tokens(pruned_text))
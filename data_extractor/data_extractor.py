@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+import asyncio
 from typing import Any, List
 from pydantic import BaseModel, Field
 
@@ -16,6 +17,17 @@ class DataExtractor(ABC):
         """
         pass
 
+    async def aextract(
+        self, text: str, output_schema: type[DataBaseModel]
+    ) -> DataBaseModel:
+        """
+        Extract structured data from text without blocking the event loop
+
+        Returns:
+            Structured data as a Pydantic model
+        """
+        return await asyncio.to_thread(self.extract, text, output_schema)
+
 
 class Example(BaseModel):
     role: str = Field(...)
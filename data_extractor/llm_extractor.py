@@ -1,17 +1,84 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from functools import lru_cache
+import json
+import os
 from pathlib import Path
-from typing import Any, Dict, List, Type
-from pydantic import BaseModel, ValidationError
+from threading import Lock
+from typing import Any, Callable, Dict, List, Type
+from weakref import WeakKeyDictionary
+from pydantic import ValidationError
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain.chat_models import init_chat_model
 from langchain_core.output_parsers import PydanticOutputParser
+from langchain_core.prompt_values import PromptValue
+from langchain_core.runnables import Runnable, RunnableConfig
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from dotenv import load_dotenv
 
 from cli.ui import CONSOLE
+from core.cache_manager import CacheManager
+from core.metrics import STAGE_DURATION
+from core.model_factory import ModelFactory
+from core.rate_limiter import get_rate_limiter
+from core.retry import (
+    LLM_MAX_RETRIES,
+    AdaptiveConcurrency,
+    ThreadAdaptiveConcurrency,
+    aretry_call,
+    is_retryable,
+    retry_call,
+)
 from core.models import DataBaseModel
-from core.utils import load_json_file
+from core.tokens import count_tokens
+from core.tracing import bind, span
+from core.utils import load_json_file, new_hasher, resolve_chunk_overlap
 from core.monitoring import MonitoringCallbackHandler
+from data_extractor.capability_registry import CapabilityRegistry
+from data_extractor.chat_model_pool import ChatModelPool
 from data_extractor.data_extractor import DataExtractor, Example, ExamplesJson
 
+load_dotenv()
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "./tmp/llm_cache")
+LLM_CACHE_SIZE_LIMIT_MB = int(os.getenv("LLM_CACHE_SIZE_LIMIT_MB", 256))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+LLM_PROVIDER_CONCURRENCY = int(os.getenv("LLM_PROVIDER_CONCURRENCY", 8))
+
+SYSTEM_PROMPT = "You are an expert extraction algorithm. Strictly respect output required and types."
+CHUNK_SYSTEM_PROMPT = (
+    "You are an expert extraction algorithm. The text is only an excerpt of a longer "
+    "document: extract the fields present in it and leave the others empty. "
+    "Strictly respect output types."
+)
+CONFLICT_SYSTEM_PROMPT = (
+    "You are an expert extraction algorithm. Different excerpts of the same document "
+    "gave different values for some fields. For each field, choose the correct value "
+    "among the candidates, using the field description. Strictly respect output types."
+)
+
+_provider_limiters: WeakKeyDictionary = WeakKeyDictionary()
+
+
+def _provider_limiter(provider: str) -> AdaptiveConcurrency:
+    # asyncio primitives belong to one event loop, so keep a set per loop
+    limiters = _provider_limiters.setdefault(asyncio.get_running_loop(), {})
+    if provider not in limiters:
+        limiters[provider] = AdaptiveConcurrency(LLM_PROVIDER_CONCURRENCY)
+    return limiters[provider]
+
+
+_thread_provider_limiters: Dict[str, ThreadAdaptiveConcurrency] = {}
+_thread_provider_limiters_lock = Lock()
+
+
+def _thread_provider_limiter(provider: str) -> ThreadAdaptiveConcurrency:
+    # Blocking calls of every thread share one limit per provider
+    with _thread_provider_limiters_lock:
+        if provider not in _thread_provider_limiters:
+            _thread_provider_limiters[provider] = ThreadAdaptiveConcurrency(
+                LLM_PROVIDER_CONCURRENCY
+            )
+        return _thread_provider_limiters[provider]
+
 
 class LLMDataExtractor(DataExtractor):
     def __init__(
@@ -21,81 +88,528 @@ class LLMDataExtractor(DataExtractor):
         llm_temperature: float = 0.1,
         examples: List[Example] | None = None,
         examples_path: Path | None = None,
+        chunk_size: int | None = None,
+        chunk_overlap: int | None = None,
+        chunk_concurrency: int = 4,
+        no_llm_cache: bool = False,
+        max_items: int | None = None,
+        time_limit: int = 1,
+        max_tokens_per_minute: int | None = None,
         **kwargs,
     ):
         super().__init__()
         self._examples = []
+        self._llm_model = llm_model
+        self._llm_provider = llm_provider
+        self._llm_temperature = llm_temperature
+        self._chunk_size = chunk_size
+        self._chunk_overlap = resolve_chunk_overlap(chunk_size, chunk_overlap)
+        self._chunk_concurrency = chunk_concurrency
+        self._rate_limiter = (
+            get_rate_limiter(
+                llm_provider,
+                llm_model,
+                max_items,
+                time_limit,
+                max_tokens_per_minute,
+            )
+            if max_items or max_tokens_per_minute
+            else None
+        )
+        self._response_cache = (
+            None
+            if no_llm_cache
+            else CacheManager(
+                LLM_CACHE_DIR,
+                size_limit_mb=LLM_CACHE_SIZE_LIMIT_MB,
+                ttl_seconds=LLM_CACHE_TTL_SECONDS,
+            )
+        )
         self.monitoring_handler = MonitoringCallbackHandler(llm_model, llm_provider)
 
-        self._llm = init_chat_model(
-            model=llm_model,
-            model_provider=llm_provider,
-            temperature=llm_temperature,
-            callbacks=[self.monitoring_handler],
-        )
+        self._llm = ChatModelPool().get(llm_provider, llm_model, llm_temperature)
 
         if examples:
             self.load_examples_json(examples)
         elif examples_path:
             self.load_examples_json_file(examples_path)
 
-    def _extract_without_tooling(
-        self, text: str, output_schema: Type[DataBaseModel]
-    ) -> DataBaseModel:
+    def _run_config(self) -> RunnableConfig:
+        # Pooled clients are shared, so monitoring is attached per call
+        return {"callbacks": [self.monitoring_handler]}
+
+    def _estimate_tokens(
+        self,
+        text: str,
+        system_prompt: str,
+        examples: List[Dict[str, str]] | None,
+    ) -> int:
+        examples = self._examples if examples is None else examples
+        return count_tokens(text) + sum(
+            count_tokens(part)
+            for part in [system_prompt, *[e["content"] for e in examples]]
+        )
+
+    def _span_attributes(self, tokens: int) -> Dict[str, Any]:
+        return {
+            "llm.provider": self._llm_provider,
+            "llm.model": self._llm_model,
+            "llm.estimated_input_tokens": tokens,
+        }
+
+    def _report_rate_limit(self, delay: float) -> None:
+        if delay >= 1:
+            CONSOLE.print(
+                f"[dim]Rate limit of {self._llm_provider}/{self._llm_model} reached, "
+                f"waited {delay:.1f}s[/dim]"
+            )
+
+    def _report_retry(self, error: Exception, attempt: int, delay: float) -> None:
+        CONSOLE.print(
+            f"[dim]{self._llm_provider}/{self._llm_model} call failed "
+            f"({type(error).__name__}), retry {attempt}/{LLM_MAX_RETRIES} "
+            f"in {delay:.1f}s[/dim]"
+        )
+
+    def _invoke(self, runnable: Runnable, input: Any, tokens: int) -> Any:
+        def call() -> Any:
+            if self._rate_limiter is not None:
+                self._report_rate_limit(self._rate_limiter.acquire(tokens))
+            with _thread_provider_limiter(self._llm_provider):
+                return runnable.invoke(input, config=self._run_config())
+
+        return retry_call(call, on_retry=self._report_retry)
+
+    async def _ainvoke(self, runnable: Runnable, input: Any, tokens: int) -> Any:
+        async def call() -> Any:
+            if self._rate_limiter is not None:
+                self._report_rate_limit(await self._rate_limiter.aacquire(tokens))
+            async with _provider_limiter(self._llm_provider):
+                return await runnable.ainvoke(input, config=self._run_config())
+
+        return await aretry_call(call, on_retry=self._report_retry)
+
+    def _without_tooling_chain(
+        self,
+        output_schema: Type[DataBaseModel],
+        system_prompt: str,
+        examples: List[Dict[str, str]] | None,
+    ) -> tuple[Runnable, PydanticOutputParser]:
         parser = PydanticOutputParser(pydantic_object=output_schema)
         prompt = ChatPromptTemplate.from_messages(
             [
                 (
                     "system",
-                    "You are an expert extraction algorithm. Strictly respect output required and types."
-                    "Wrap the output in `json` tags\n{format_instructions}",
+                    system_prompt.replace("{", "{{").replace("}", "}}")
+                    + "Wrap the output in `json` tags\n{format_instructions}",
                 ),
                 MessagesPlaceholder("examples"),
                 ("human", "{text}"),
             ]
         ).partial(
             format_instructions=parser.get_format_instructions(),
-            examples=self._examples,
+            examples=self._examples if examples is None else examples,
         )
-        chain = prompt | self._llm | parser
-        return chain.invoke({"text": text})
+        # The parser runs apart from the chain so that validation is timed
+        return prompt | self._llm, parser
 
-    def _extract_with_tooling(
-        self, text: str, output_schema: Type[DataBaseModel]
+    @staticmethod
+    def _validate(
+        validate: Callable[[Any], DataBaseModel], value: Any
     ) -> DataBaseModel:
+        with span("model_validate"), STAGE_DURATION.time(stage="validation"):
+            return validate(value)
+
+    def _with_tooling_prompt(
+        self,
+        text: str,
+        system_prompt: str,
+        examples: List[Dict[str, str]] | None,
+    ) -> PromptValue:
         prompt_template = ChatPromptTemplate.from_messages(
             [
-                (
-                    "system",
-                    "You are an expert extraction algorithm. Strictly respect output required and types.",
-                ),
+                ("system", "{system_prompt}"),
                 MessagesPlaceholder("examples"),
                 ("human", "{text}"),
             ]
         )
-        prompt = prompt_template.invoke({"text": text, "examples": self._examples})
-        llm = self._llm.with_structured_output(schema=output_schema)
-        result = llm.invoke(prompt)
-        return output_schema.model_validate(result)
+        return prompt_template.invoke(
+            {
+                "system_prompt": system_prompt,
+                "text": text,
+                "examples": self._examples if examples is None else examples,
+            }
+        )
 
-    def extract(self, text: str, output_schema: Type[DataBaseModel]) -> DataBaseModel:
-        self.start_monitoring(text)
+    def _extract_without_tooling(
+        self,
+        text: str,
+        output_schema: Type[DataBaseModel],
+        system_prompt: str = SYSTEM_PROMPT,
+        examples: List[Dict[str, str]] | None = None,
+    ) -> DataBaseModel:
+        chain, parser = self._without_tooling_chain(
+            output_schema, system_prompt, examples
+        )
+        tokens = self._estimate_tokens(text, system_prompt, examples)
+        with span("extract_without_tooling", self._span_attributes(tokens)):
+            message = self._invoke(chain, {"text": text}, tokens)
+            return self._validate(parser.invoke, message)
 
-        result = None
+    async def _aextract_without_tooling(
+        self,
+        text: str,
+        output_schema: Type[DataBaseModel],
+        system_prompt: str = SYSTEM_PROMPT,
+        examples: List[Dict[str, str]] | None = None,
+    ) -> DataBaseModel:
+        chain, parser = self._without_tooling_chain(
+            output_schema, system_prompt, examples
+        )
+        tokens = await asyncio.to_thread(
+            self._estimate_tokens, text, system_prompt, examples
+        )
+        with span("extract_without_tooling", self._span_attributes(tokens)):
+            message = await self._ainvoke(chain, {"text": text}, tokens)
+            return self._validate(parser.invoke, message)
+
+    def _extract_with_tooling(
+        self,
+        text: str,
+        output_schema: Type[DataBaseModel],
+        system_prompt: str = SYSTEM_PROMPT,
+        examples: List[Dict[str, str]] | None = None,
+    ) -> DataBaseModel:
+        tokens = self._estimate_tokens(text, system_prompt, examples)
+        with span("extract_with_tooling", self._span_attributes(tokens)):
+            prompt = self._with_tooling_prompt(text, system_prompt, examples)
+            llm = self._llm.with_structured_output(schema=output_schema)
+            result = self._invoke(llm, prompt, tokens)
+            return self._validate(output_schema.model_validate, result)
+
+    async def _aextract_with_tooling(
+        self,
+        text: str,
+        output_schema: Type[DataBaseModel],
+        system_prompt: str = SYSTEM_PROMPT,
+        examples: List[Dict[str, str]] | None = None,
+    ) -> DataBaseModel:
+        tokens = await asyncio.to_thread(
+            self._estimate_tokens, text, system_prompt, examples
+        )
+        with span("extract_with_tooling", self._span_attributes(tokens)):
+            prompt = self._with_tooling_prompt(text, system_prompt, examples)
+            llm = self._llm.with_structured_output(schema=output_schema)
+            result = await self._ainvoke(llm, prompt, tokens)
+            return self._validate(output_schema.model_validate, result)
+
+    def _response_cache_key(
+        self,
+        text: str,
+        output_schema: Type[DataBaseModel],
+        system_prompt: str,
+        examples: List[Dict[str, str]],
+    ) -> str:
+        payload = json.dumps(
+            {
+                "text": " ".join(text.split()),
+                "schema": output_schema.model_json_schema(),
+                "system_prompt": system_prompt,
+                "examples": examples,
+                "model": self._llm_model,
+                "provider": self._llm_provider,
+                "temperature": self._llm_temperature,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+            default=str,
+        )
+        digest = new_hasher()
+        digest.update(payload.encode())
+        return f"llm:{digest.hexdigest()}"
+
+    def _get_cached_response(
+        self, cache_key: str, output_schema: Type[DataBaseModel]
+    ) -> DataBaseModel | None:
+        cached = self._response_cache.get(cache_key)
+        if cached is None:
+            return None
         try:
-            result = self._extract_with_tooling(text, output_schema)
-        except Exception as e:
-            if isinstance(e, ValidationError):
-                raise e
-            CONSOLE.print(
-                "Structured output not supported by the model. "
-                "Trying without tooling. It may fail."
+            result = output_schema.model_validate(cached)
+        except ValidationError:
+            # Validators changed since the response was cached
+            return None
+        self.monitoring_handler.record_cache_hit()
+        return result
+
+    def _lookup_response(
+        self,
+        text: str,
+        output_schema: Type[DataBaseModel],
+        system_prompt: str,
+        examples: List[Dict[str, str]],
+    ) -> tuple[str | None, DataBaseModel | None]:
+        if self._response_cache is None:
+            return None, None
+        cache_key = self._response_cache_key(
+            text, output_schema, system_prompt, examples
+        )
+        return cache_key, self._get_cached_response(cache_key, output_schema)
+
+    def _store_response(self, cache_key: str | None, result: DataBaseModel) -> None:
+        if self._response_cache is not None:
+            self._response_cache.set(cache_key, result.model_dump(mode="json"))
+
+    def _structured_output_support(self) -> bool | None:
+        structured_output = CapabilityRegistry().supports_structured_output(
+            self._llm_provider, self._llm_model
+        )
+        self.monitoring_handler.structured_output = structured_output
+        return structured_output
+
+    def _record_structured_output(self, supported: bool) -> None:
+        CapabilityRegistry().record(self._llm_provider, self._llm_model, supported)
+        self.monitoring_handler.structured_output = supported
+
+    def _extract(
+        self,
+        text: str,
+        output_schema: Type[DataBaseModel],
+        system_prompt: str = SYSTEM_PROMPT,
+        examples: List[Dict[str, str]] | None = None,
+    ) -> DataBaseModel:
+        examples = self._examples if examples is None else examples
+
+        cache_key, cached = self._lookup_response(
+            text, output_schema, system_prompt, examples
+        )
+        if cached is not None:
+            return cached
+
+        structured_output = self._structured_output_support()
+        if structured_output is False:
+            result = self._extract_without_tooling(
+                text, output_schema, system_prompt, examples
             )
-            result = self._extract_without_tooling(text, output_schema)
+        else:
+            try:
+                result = self._extract_with_tooling(
+                    text, output_schema, system_prompt, examples
+                )
+                if structured_output is None:
+                    self._record_structured_output(True)
+            except Exception as e:
+                # Provider errors that outlived the retries say nothing
+                # about structured output support
+                if isinstance(e, ValidationError) or is_retryable(e):
+                    raise e
+                CONSOLE.print(
+                    "Structured output not supported by the model. "
+                    "Trying without tooling. It may fail."
+                )
+                result = self._extract_without_tooling(
+                    text, output_schema, system_prompt, examples
+                )
+                # Only remember the failure once the fallback proved the model
+                # itself works, so transient errors do not disable tooling. A
+                # model known to support it only falls back for this call
+                if structured_output is None:
+                    self._record_structured_output(False)
 
-        self.stop_monitoring(result)
+        self._store_response(cache_key, result)
         return result
 
+    async def _aextract(
+        self,
+        text: str,
+        output_schema: Type[DataBaseModel],
+        system_prompt: str = SYSTEM_PROMPT,
+        examples: List[Dict[str, str]] | None = None,
+    ) -> DataBaseModel:
+        examples = self._examples if examples is None else examples
+
+        # Cache and registry I/O is done off the event loop, which only
+        # waits on the LLM calls
+        cache_key, cached = await asyncio.to_thread(
+            self._lookup_response, text, output_schema, system_prompt, examples
+        )
+        if cached is not None:
+            return cached
+
+        structured_output = await asyncio.to_thread(self._structured_output_support)
+        if structured_output is False:
+            result = await self._aextract_without_tooling(
+                text, output_schema, system_prompt, examples
+            )
+        else:
+            try:
+                result = await self._aextract_with_tooling(
+                    text, output_schema, system_prompt, examples
+                )
+                if structured_output is None:
+                    await asyncio.to_thread(self._record_structured_output, True)
+            except Exception as e:
+                # Provider errors that outlived the retries say nothing
+                # about structured output support
+                if isinstance(e, ValidationError) or is_retryable(e):
+                    raise e
+                CONSOLE.print(
+                    "Structured output not supported by the model. "
+                    "Trying without tooling. It may fail."
+                )
+                result = await self._aextract_without_tooling(
+                    text, output_schema, system_prompt, examples
+                )
+                if structured_output is None:
+                    await asyncio.to_thread(self._record_structured_output, False)
+
+        await asyncio.to_thread(self._store_response, cache_key, result)
+        return result
+
+    def _split_text(self, text: str) -> List[str]:
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self._chunk_size,
+            chunk_overlap=self._chunk_overlap,
+            length_function=count_tokens,
+        )
+        return splitter.split_text(text)
+
+    def _extract_chunk(
+        self, chunk: str, partial_schema: Type[DataBaseModel]
+    ) -> DataBaseModel | None:
+        try:
+            return self._extract(chunk, partial_schema, CHUNK_SYSTEM_PROMPT)
+        except Exception as e:
+            CONSOLE.print(f"Extraction failed on a chunk, skipping it: {e}")
+            return None
+
+    async def _aextract_chunk(
+        self, chunk: str, partial_schema: Type[DataBaseModel]
+    ) -> DataBaseModel | None:
+        try:
+            return await self._aextract(chunk, partial_schema, CHUNK_SYSTEM_PROMPT)
+        except Exception as e:
+            CONSOLE.print(f"Extraction failed on a chunk, skipping it: {e}")
+            return None
+
+    @staticmethod
+    def _conflicts_prompt(
+        conflicts: Dict[str, List[Any]], output_schema: Type[DataBaseModel]
+    ) -> tuple[str, Type[DataBaseModel]]:
+        conflict_schema = ModelFactory.create_partial_model(
+            output_schema, list(conflicts)
+        )
+        candidates = {
+            name: {
+                "title": output_schema.model_fields[name].title,
+                "description": output_schema.model_fields[name].description,
+                "candidates": values,
+            }
+            for name, values in conflicts.items()
+        }
+        return json.dumps(candidates, ensure_ascii=False, default=str), conflict_schema
+
+    def _resolve_conflicts(
+        self, conflicts: Dict[str, List[Any]], output_schema: Type[DataBaseModel]
+    ) -> Dict[str, Any]:
+        text, conflict_schema = self._conflicts_prompt(conflicts, output_schema)
+        result = self._extract(
+            text, conflict_schema, CONFLICT_SYSTEM_PROMPT, examples=[]
+        )
+        return result.model_dump(exclude_none=True)
+
+    async def _aresolve_conflicts(
+        self, conflicts: Dict[str, List[Any]], output_schema: Type[DataBaseModel]
+    ) -> Dict[str, Any]:
+        text, conflict_schema = self._conflicts_prompt(conflicts, output_schema)
+        result = await self._aextract(
+            text, conflict_schema, CONFLICT_SYSTEM_PROMPT, examples=[]
+        )
+        return result.model_dump(exclude_none=True)
+
+    @staticmethod
+    def _merge_partials(
+        partials: List[DataBaseModel | None], output_schema: Type[DataBaseModel]
+    ) -> tuple[Dict[str, Any], Dict[str, List[Any]]]:
+        dumps = [
+            partial.model_dump(exclude_none=True)
+            for partial in partials
+            if partial is not None
+        ]
+
+        merged: Dict[str, Any] = {}
+        conflicts: Dict[str, List[Any]] = {}
+        for name in output_schema.model_fields:
+            candidates: Dict[str, Any] = {}
+            for partial in dumps:
+                if name in partial:
+                    key = " ".join(
+                        json.dumps(partial[name], sort_keys=True, default=str)
+                        .casefold()
+                        .split()
+                    )
+                    candidates.setdefault(key, partial[name])
+
+            if len(candidates) == 1:
+                merged[name] = next(iter(candidates.values()))
+            elif len(candidates) > 1:
+                conflicts[name] = list(candidates.values())
+
+        return merged, conflicts
+
+    def _extract_chunked(
+        self, chunks: List[str], output_schema: Type[DataBaseModel]
+    ) -> DataBaseModel:
+        partial_schema = ModelFactory.create_partial_model(output_schema)
+
+        # Executor threads do not inherit the span context of the caller
+        extract_chunk = bind(lambda chunk: self._extract_chunk(chunk, partial_schema))
+        with ThreadPoolExecutor(max_workers=self._chunk_concurrency) as executor:
+            partials = list(executor.map(extract_chunk, chunks))
+
+        merged, conflicts = self._merge_partials(partials, output_schema)
+        if conflicts:
+            merged.update(self._resolve_conflicts(conflicts, output_schema))
+
+        return self._validate(output_schema.model_validate, merged)
+
+    async def _aextract_chunked(
+        self, chunks: List[str], output_schema: Type[DataBaseModel]
+    ) -> DataBaseModel:
+        partial_schema = ModelFactory.create_partial_model(output_schema)
+        slots = asyncio.Semaphore(self._chunk_concurrency)
+
+        async def extract_chunk(chunk: str) -> DataBaseModel | None:
+            async with slots:
+                return await self._aextract_chunk(chunk, partial_schema)
+
+        partials = await asyncio.gather(*(extract_chunk(chunk) for chunk in chunks))
+
+        merged, conflicts = self._merge_partials(partials, output_schema)
+        if conflicts:
+            merged.update(await self._aresolve_conflicts(conflicts, output_schema))
+
+        return self._validate(output_schema.model_validate, merged)
+
+    def extract(self, text: str, output_schema: Type[DataBaseModel]) -> DataBaseModel:
+        chunks = self._split_text(text) if self._chunk_size else [text]
+        if len(chunks) > 1:
+            return self._extract_chunked(chunks, output_schema)
+        return self._extract(text, output_schema)
+
+    async def aextract(
+        self, text: str, output_schema: Type[DataBaseModel]
+    ) -> DataBaseModel:
+        # Splitting counts the tokens of the whole text
+        chunks = (
+            await asyncio.to_thread(self._split_text, text)
+            if self._chunk_size
+            else [text]
+        )
+        if len(chunks) > 1:
+            return await self._aextract_chunked(chunks, output_schema)
+        return await self._aextract(text, output_schema)
+
     def load_examples_json(self, examples: Dict[str, Any]) -> None:
         self._examples = [
             {"role": example["role"], "content": str(example["content"])}  # type: ignore
@@ -107,9 +621,3 @@ class LLMDataExtractor(DataExtractor):
         json = load_json_file(json_file_path)
         ExamplesJson.model_validate(json)
         self.load_examples_json(json["examples"])
-
-    def start_monitoring(self, text: str) -> None:
-        self.monitoring_handler.input_tokens = len(text.split())
-
-    def stop_monitoring(self, result: BaseModel) -> None:
-        self.monitoring_handler.output_tokens = len(str(result).split())
@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
 from enum import Enum
 from functools import lru_cache
-from typing import List
+from pathlib import Path
+from typing import Dict, List, NamedTuple
 
 from core.cache_manager import CacheManager
+from core.utils import file_hash
 
 
 class Strategy(Enum):
@@ -12,25 +14,65 @@ class Strategy(Enum):
     FAST = "fast"
 
 
+# Page numbers per source of their text, "text_layer" or "ocr"
+PageSources = Dict[str, List[int]]
+
+
+class TextContent(NamedTuple):
+    text: str
+    page_sources: PageSources | None = None
+
+
 class TextExtractor(ABC):
+    name: str = "base"
+    version: str = "1"
+
     def __init__(
         self,
         languages: List[str] | None = None,
         use_cache: bool = True,
         strategy: Strategy = Strategy.AUTO,
+        page_workers: int = 1,
+        use_text_layer: bool = True,
     ):
         self._languages = languages or []
         self._use_cache = use_cache
         self._cache_manager = CacheManager()
         self._strategy = strategy
+        self._page_workers = page_workers
+        self._use_text_layer = use_text_layer
+
+    def _cache_key(self, file_path: str, content_hash: str | None = None) -> str:
+        return ":".join(
+            [
+                self.name,
+                self.version,
+                self._strategy.value,
+                ",".join(self._languages),
+                content_hash or file_hash(Path(file_path)),
+            ]
+        )
 
     @abstractmethod
     @lru_cache
-    def get_text_content(self, file_path: str) -> str:
+    def get_text_content(self, file_path: str, content_hash: str | None = None) -> str:
         """
-        Extract text content from a file
+        Extract text content from a file. The content hash, when already
+        known, avoids reading the file again to compute the cache key
 
         Returns:
             Extracted text content
         """
         pass
+
+    def get_page_sources(
+        self, file_path: str, content_hash: str | None = None
+    ) -> PageSources | None:
+        """
+        Where the text of each page of a file comes from, for extractors that
+        choose between the text layer and OCR page by page
+
+        Returns:
+            Page numbers per source, None when not decided per page
+        """
+        return None
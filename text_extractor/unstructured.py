@@ -1,49 +1,236 @@
 import os
-from typing import List
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List
 from functools import lru_cache
+from dotenv import load_dotenv
 from langchain_unstructured import UnstructuredLoader
 from unstructured.cleaners.core import group_broken_paragraphs, auto_paragraph_grouper
 from langchain_core.documents import Document
+from pypdf.errors import PyPdfError
+from unstructured.__version__ import __version__ as unstructured_version
 
-from text_extractor.text_extractor import Strategy, TextExtractor
+from cli.ui import CONSOLE
+from core.tracing import bind, span
+from core.utils import (
+    extract_pdf_text_layer,
+    get_pdf_page_count,
+    group_page_ranges,
+    write_pdf_pages,
+)
+from text_extractor.text_extractor import PageSources, Strategy, TextExtractor
+
+load_dotenv()
+PAGES_PER_SHARD = int(os.getenv("PAGES_PER_SHARD", 8))
+MIN_TEXT_LAYER_CHARS = int(os.getenv("MIN_TEXT_LAYER_CHARS", 32))
+
+
+def _create_loader(strategy: str, languages: List[str]) -> UnstructuredLoader:
+    return UnstructuredLoader(
+        partition_via_api=os.getenv("UNSTRUCTURED_API_KEY") is not None,
+        strategy=strategy,
+        languages=languages,
+        post_processors=[group_broken_paragraphs, auto_paragraph_grouper],
+    )
+
+
+def _partition_pages(
+    file_path: str,
+    first_page: int,
+    last_page: int,
+    strategy: str,
+    languages: List[str],
+) -> Dict[int, str]:
+    pages: Dict[int, List[str]] = {
+        page: [] for page in range(first_page, last_page + 1)
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        shard_path = Path(tmp_dir) / f"pages_{first_page}_{last_page}.pdf"
+        write_pdf_pages(Path(file_path), first_page, last_page, shard_path)
+
+        loader = _create_loader(strategy, languages)
+        loader.file_path = str(shard_path)
+        with span("UnstructuredLoader.load", {"pages": f"{first_page}-{last_page}"}):
+            documents = loader.load()
+        for doc in documents:
+            page = first_page + doc.metadata.get("page_number", 1) - 1
+            pages[page].append(doc.page_content)
+
+    return {page: "\n".join(contents) for page, contents in pages.items()}
 
 
 class UnstructuredTextExtractor(TextExtractor):
+    name = "unstructured"
+    version = f"4-{unstructured_version}"
+
     def __init__(
         self,
         languages: List[str] = [],
         use_cache: bool = True,
         strategy: Strategy = Strategy.AUTO,
+        page_workers: int = 1,
+        use_text_layer: bool = True,
     ):
-        super().__init__(languages, use_cache, strategy)
+        super().__init__(languages, use_cache, strategy, page_workers, use_text_layer)
         self._loader = None
 
     @property
     def loader(self) -> UnstructuredLoader:
         if self._loader is None:
-            self._loader = UnstructuredLoader(
-                partition_via_api=os.getenv("UNSTRUCTURED_API_KEY") is not None,
-                strategy=self._strategy.value,
-                languages=self._languages,
-                post_processors=[group_broken_paragraphs, auto_paragraph_grouper],
-            )
+            self._loader = _create_loader(self._strategy.value, self._languages)
         return self._loader
 
-    def _load_file(self, file_path: str) -> list[Document]:
-        if self._use_cache:
-            cached = self._cache_manager.get(file_path)
-            if cached:
-                return cached
+    def _cache_key(self, file_path: str, content_hash: str | None = None) -> str:
+        mode = "api" if os.getenv("UNSTRUCTURED_API_KEY") is not None else "local"
+        text_layer = "text" if self._uses_text_layer() else "ocr"
+        return f"{super()._cache_key(file_path, content_hash)}:{mode}:{text_layer}"
+
+    def _uses_text_layer(self) -> bool:
+        # The fast strategy already reads the text layer without OCR
+        return self._use_text_layer and self._strategy != Strategy.FAST
+
+    def _partition_source(self, text_layer_checked: bool) -> str | None:
+        """
+        Source of the text of pages partitioned by unstructured
+
+        Returns:
+            "text_layer" or "ocr", None when the strategy picks it per file
+        """
+        if self._strategy == Strategy.FAST:
+            return "text_layer"
+        # The auto strategy OCRs pages known to lack a text layer
+        if self._strategy == Strategy.HI_RES or text_layer_checked:
+            return "ocr"
+        return None
+
+    def _ocr_pages(
+        self, file_path: str, cache_key: str | None, ocr_pages: List[int]
+    ) -> Dict[int, str]:
+        pages: Dict[int, str] = {}
+        missing: List[int] = []
 
+        for page in ocr_pages:
+            cached = (
+                self._cache_manager.get(f"{cache_key}:page:{page}")
+                if self._use_cache
+                else None
+            )
+            if cached is not None:
+                pages[page] = cached
+            else:
+                missing.append(page)
+
+        shards = group_page_ranges(missing, PAGES_PER_SHARD)
+        shard_args = [
+            (file_path, first, last, self._strategy.value, self._languages)
+            for first, last in shards
+        ]
+
+        def store(shard_pages: Dict[int, str]) -> None:
+            # Cache each shard as soon as it is done so a crashed run
+            # only redoes the pages that were not reached
+            for page, text in shard_pages.items():
+                pages[page] = text
+                if self._use_cache:
+                    self._cache_manager.set(f"{cache_key}:page:{page}", text)
+
+        if self._page_workers > 1 and len(shards) > 1:
+            with ProcessPoolExecutor(max_workers=self._page_workers) as executor:
+                partition_pages = bind(_partition_pages)
+                futures = [executor.submit(partition_pages, *a) for a in shard_args]
+                for future in as_completed(futures):
+                    store(future.result())
+        else:
+            for args in shard_args:
+                store(_partition_pages(*args))
+
+        return pages
+
+    def _load_pdf(
+        self, file_path: str, cache_key: str | None
+    ) -> tuple[list[str], PageSources]:
+        page_texts = None
+        text_layer_checked = False
+        if self._uses_text_layer():
+            try:
+                page_texts = extract_pdf_text_layer(Path(file_path))
+                text_layer_checked = True
+            except Exception as e:
+                CONSOLE.print(
+                    f"[yellow]{Path(file_path).name}: unreadable text layer ({e}), "
+                    "falling back to OCR for all pages[/yellow]"
+                )
+        if page_texts is None:
+            page_texts = [""] * get_pdf_page_count(Path(file_path))
+
+        pages: Dict[int, str] = {}
+        ocr_pages: List[int] = []
+        for page, text in enumerate(page_texts, 1):
+            if len(text.strip()) >= MIN_TEXT_LAYER_CHARS:
+                pages[page] = group_broken_paragraphs(text.strip())
+            else:
+                ocr_pages.append(page)
+        page_sources = None
+        partition_source = self._partition_source(text_layer_checked)
+        if partition_source is not None:
+            page_sources = {"text_layer": sorted(pages), "ocr": []}
+            page_sources[partition_source] += ocr_pages
+
+        pages.update(self._ocr_pages(file_path, cache_key, ocr_pages))
+        return [pages[page] for page in sorted(pages) if pages[page]], page_sources
+
+    def _load_whole_file(self, file_path: str) -> tuple[list[str], List[int]]:
         self.loader.file_path = file_path
-        document = self.loader.load()
+        with span("UnstructuredLoader.load"):
+            document: list[Document] = self.loader.load()
+        pages = {doc.metadata.get("page_number", 1) for doc in document}
+        return [doc.page_content for doc in document], sorted(pages)
 
+    @lru_cache
+    def _load_file(
+        self, file_path: str, content_hash: str | None = None
+    ) -> tuple[list[str], PageSources | None]:
+        cache_key = None
         if self._use_cache:
-            self._cache_manager.set(file_path, document)
+            cache_key = self._cache_key(file_path, content_hash)
+            cached = self._cache_manager.get(cache_key)
+            if cached is not None:
+                return cached["contents"], cached["page_sources"]
 
-        return document
+        page_sources = None
+        is_pdf = Path(file_path).suffix.lower() == ".pdf"
+        if is_pdf and (self._uses_text_layer() or self._page_workers > 1):
+            try:
+                contents, page_sources = self._load_pdf(file_path, cache_key)
+            except PyPdfError as e:
+                # pypdf cannot split the file into shards, unstructured parses
+                # PDFs on its own and may still OCR it
+                CONSOLE.print(
+                    f"[yellow]{Path(file_path).name}: malformed PDF ({e}), "
+                    "falling back to parsing the whole file[/yellow]"
+                )
+                contents, file_pages = self._load_whole_file(file_path)
+                partition_source = self._partition_source(False)
+                if partition_source is not None:
+                    page_sources = {"text_layer": [], "ocr": []}
+                    page_sources[partition_source] = file_pages
+        else:
+            contents, _ = self._load_whole_file(file_path)
+
+        if self._use_cache:
+            self._cache_manager.set(
+                cache_key, {"contents": contents, "page_sources": page_sources}
+            )
+
+        return contents, page_sources
 
     @lru_cache
-    def get_text_content(self, file_path: str) -> str:
-        document = self._load_file(file_path)
-        return "\n".join([doc.page_content for doc in document])
+    def get_text_content(self, file_path: str, content_hash: str | None = None) -> str:
+        return "\n".join(self._load_file(file_path, content_hash)[0])
+
+    def get_page_sources(
+        self, file_path: str, content_hash: str | None = None
+    ) -> PageSources | None:
+        return self._load_file(file_path, content_hash)[1]
@@ -1,61 +1,55 @@
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta, timezone
+import json
+import os
+from pathlib import Path
+import socket
+import sqlite3
+import threading
 import uuid
-from typing import Dict, Any
+from typing import Dict, Any, List
+from dotenv import load_dotenv
 from web.models import JobStatus, JobResponse
 
+load_dotenv()
+JOB_STORE_BACKEND = os.getenv("JOB_STORE_BACKEND", "sqlite")
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "./tmp/jobs.db")
 
-class JobStore:
-    _instance = None
-    _jobs: Dict[str, JobResponse] = {}
-    _max_active_jobs = 5
-    _retention_period = timedelta(minutes=5)
+ACTIVE_STATUSES = [JobStatus.PENDING, JobStatus.PROCESSING]
+COMPLETED_STATUSES = [JobStatus.COMPLETED, JobStatus.FAILED]
 
-    def __new__(cls):
-        if cls._instance is None:
-            cls._instance = super().__new__(cls)
-        return cls._instance
 
-    def cleanup_old_jobs(self):
-        now = datetime.now(timezone.utc)
-        completed_statuses = [JobStatus.COMPLETED, JobStatus.FAILED]
+class JobStore(ABC):
+    def __init__(self):
+        self._max_active_jobs = 5
+        self._retention_period = timedelta(minutes=5)
 
-        self._jobs = {
-            job_id: job
-            for job_id, job in self._jobs.items()
-            if not job.fetched
-            or job.status not in completed_statuses
-            or (now - job.created_at) < self._retention_period
-        }
+    @abstractmethod
+    def cleanup_old_jobs(self):
+        pass
 
+    @abstractmethod
     def create_job(self) -> str:
-        self.cleanup_old_jobs()
-
-        job_id = str(uuid.uuid4())
-        self._jobs[job_id] = JobResponse(job_id=job_id, status=JobStatus.PENDING)
-        return job_id
+        pass
 
-    def get_job(self, job_id: str) -> JobResponse:
-        job = self._jobs.get(job_id)
-        if job and job.status in [JobStatus.COMPLETED, JobStatus.FAILED]:
-            job.fetched = True
-        return job
+    @abstractmethod
+    def get_job(self, job_id: str) -> JobResponse | None:
+        pass
 
+    @abstractmethod
     def update_job(
-        self, job_id: str, status: JobStatus, result: Any = None, error: str = None
+        self,
+        job_id: str,
+        status: JobStatus,
+        result: Any = None,
+        error: str = None,
+        page_sources: Dict[str, List[int]] | None = None,
     ):
-        if job_id in self._jobs:
-            self._jobs[job_id].status = status
-            if result is not None:
-                self._jobs[job_id].result = result
-            if error is not None:
-                self._jobs[job_id].error = error
+        pass
 
+    @abstractmethod
     def count_active_jobs(self) -> int:
-        return sum(
-            1
-            for job in self._jobs.values()
-            if job.status in [JobStatus.PENDING, JobStatus.PROCESSING]
-        )
+        pass
 
     def can_accept_job(self) -> bool:
         return self.count_active_jobs() < self._max_active_jobs
@@ -79,3 +73,260 @@ class JobStore:
         if value < timedelta(minutes=5):
             raise ValueError("Retention period must be at least 5 minutes")
         self._retention_period = value
+
+
+class InMemoryJobStore(JobStore):
+    def __init__(self):
+        super().__init__()
+        self._jobs: Dict[str, JobResponse] = {}
+        # Jobs are created and updated from threadpool threads
+        self._lock = threading.Lock()
+
+    def cleanup_old_jobs(self):
+        with self._lock:
+            self._remove_old_jobs()
+
+    def _remove_old_jobs(self):
+        now = datetime.now(timezone.utc)
+
+        self._jobs = {
+            job_id: job
+            for job_id, job in self._jobs.items()
+            if not job.fetched
+            or job.status not in COMPLETED_STATUSES
+            or (now - job.created_at) < self._retention_period
+        }
+
+    def create_job(self) -> str:
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._remove_old_jobs()
+            self._jobs[job_id] = JobResponse(job_id=job_id, status=JobStatus.PENDING)
+        return job_id
+
+    def get_job(self, job_id: str) -> JobResponse | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job.status in COMPLETED_STATUSES:
+                job.fetched = True
+            return job
+
+    def update_job(
+        self,
+        job_id: str,
+        status: JobStatus,
+        result: Any = None,
+        error: str = None,
+        page_sources: Dict[str, List[int]] | None = None,
+    ):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].status = status
+                if result is not None:
+                    self._jobs[job_id].result = result
+                if error is not None:
+                    self._jobs[job_id].error = error
+                if page_sources is not None:
+                    self._jobs[job_id].page_sources = page_sources
+
+    def count_active_jobs(self) -> int:
+        with self._lock:
+            return sum(
+                1 for job in self._jobs.values() if job.status in ACTIVE_STATUSES
+            )
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Job store shared by every API worker process of a host. Active jobs are
+    counted per owning process since each process has its own executors.
+    An owner is unique to a process start, as a restarted container often
+    gets the hostname and PID of the previous one.
+    """
+
+    _CLEANUP_INTERVAL = timedelta(seconds=30)
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,
+            result TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            fetched INTEGER NOT NULL DEFAULT 0,
+            owner TEXT NOT NULL,
+            page_sources TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_status_owner ON jobs (status, owner);
+        CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs (created_at);
+        CREATE TABLE IF NOT EXISTS owners (
+            hostname TEXT NOT NULL,
+            pid INTEGER NOT NULL,
+            owner TEXT NOT NULL,
+            PRIMARY KEY (hostname, pid)
+        );
+    """
+
+    def __init__(self, path: str = JOB_STORE_PATH):
+        super().__init__()
+        self._path = Path(path)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._hostname = socket.gethostname()
+        self._owner = f"{self._hostname}:{os.getpid()}:{uuid.uuid4().hex}"
+        self._last_cleanup = datetime.min.replace(tzinfo=timezone.utc)
+
+        with self._connection() as conn:
+            conn.executescript(self._SCHEMA)
+            # The latest owner registered for a PID is the one running it
+            conn.execute(
+                "INSERT OR REPLACE INTO owners (hostname, pid, owner) VALUES (?, ?, ?)",
+                [self._hostname, os.getpid(), self._owner],
+            )
+        self._recover_orphaned_jobs()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _recover_orphaned_jobs(self):
+        # Jobs left active by a process of this host that is no longer running
+        # will never complete, whether its PID is free or reused by another one
+        with self._connection() as conn:
+            owners = conn.execute(
+                "SELECT DISTINCT owner FROM jobs WHERE status IN (?, ?)",
+                [status.value for status in ACTIVE_STATUSES],
+            ).fetchall()
+            for (owner,) in owners:
+                hostname, pid = owner.rsplit(":", 2)[:2]
+                if hostname != self._hostname or owner == self._owner:
+                    continue
+                running = conn.execute(
+                    "SELECT owner FROM owners WHERE hostname = ? AND pid = ?",
+                    [hostname, int(pid)],
+                ).fetchone()
+                if not _process_exists(int(pid)) or running != (owner,):
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ? "
+                        "WHERE owner = ? AND status IN (?, ?)",
+                        [
+                            JobStatus.FAILED.value,
+                            "Job interrupted by a server restart",
+                            owner,
+                            *[status.value for status in ACTIVE_STATUSES],
+                        ],
+                    )
+
+    def cleanup_old_jobs(self):
+        now = datetime.now(timezone.utc)
+        if now - self._last_cleanup < self._CLEANUP_INTERVAL:
+            return
+        self._last_cleanup = now
+
+        with self._connection() as conn:
+            conn.execute(
+                "DELETE FROM jobs WHERE created_at < ? AND fetched = 1 "
+                "AND status IN (?, ?)",
+                [
+                    (now - self._retention_period).timestamp(),
+                    *[status.value for status in COMPLETED_STATUSES],
+                ],
+            )
+
+    def create_job(self) -> str:
+        self.cleanup_old_jobs()
+
+        job = JobResponse(job_id=str(uuid.uuid4()), status=JobStatus.PENDING)
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, created_at, owner) "
+                "VALUES (?, ?, ?, ?)",
+                [job.job_id, job.status.value, job.created_at.timestamp(), self._owner],
+            )
+        return job.job_id
+
+    def get_job(self, job_id: str) -> JobResponse | None:
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT job_id, status, result, error, created_at, fetched, "
+                "page_sources FROM jobs WHERE job_id = ?",
+                [job_id],
+            ).fetchone()
+            if row is None:
+                return None
+
+            job = JobResponse(
+                job_id=row[0],
+                status=JobStatus(row[1]),
+                result=json.loads(row[2]) if row[2] is not None else None,
+                error=row[3],
+                created_at=datetime.fromtimestamp(row[4], timezone.utc),
+                fetched=bool(row[5]),
+                page_sources=json.loads(row[6]) if row[6] is not None else None,
+            )
+            if job.status in COMPLETED_STATUSES and not job.fetched:
+                conn.execute("UPDATE jobs SET fetched = 1 WHERE job_id = ?", [job_id])
+                job.fetched = True
+        return job
+
+    def update_job(
+        self,
+        job_id: str,
+        status: JobStatus,
+        result: Any = None,
+        error: str = None,
+        page_sources: Dict[str, List[int]] | None = None,
+    ):
+        with self._connection() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, "
+                "result = COALESCE(?, result), error = COALESCE(?, error), "
+                "page_sources = COALESCE(?, page_sources) "
+                "WHERE job_id = ?",
+                [
+                    status.value,
+                    json.dumps(result, default=str) if result is not None else None,
+                    error,
+                    json.dumps(page_sources) if page_sources is not None else None,
+                    job_id,
+                ],
+            )
+
+    def count_active_jobs(self) -> int:
+        with self._connection() as conn:
+            (count,) = conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE owner = ? AND status IN (?, ?)",
+                [self._owner, *[status.value for status in ACTIVE_STATUSES]],
+            ).fetchone()
+        return count
+
+
+def _process_exists(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_job_store: JobStore | None = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    global _job_store
+    with _job_store_lock:
+        if _job_store is None:
+            if JOB_STORE_BACKEND == "sqlite":
+                _job_store = SQLiteJobStore()
+            elif JOB_STORE_BACKEND == "memory":
+                _job_store = InMemoryJobStore()
+            else:
+                raise ValueError(f"Unknown job store backend: {JOB_STORE_BACKEND}")
+    return _job_store
@@ -1,11 +1,12 @@
 from enum import Enum
-from pydantic import BaseModel, Field
-from typing import Optional, Any, Dict
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional, Any, Dict, List
 from datetime import datetime, timezone
 from text_extractor.unstructured import Strategy
 
 from core.models import DataBaseModel
 from core.model_factory import ModelFactory
+from core.utils import resolve_chunk_overlap
 
 
 class JobStatus(str, Enum):
@@ -20,7 +21,9 @@ class JobResponse(BaseModel):
     status: JobStatus
     result: Optional[Any] = None
     error: Optional[str] = None
-    created_at: datetime = Field(default=datetime.now(timezone.utc))
+    # Page numbers read from the PDF text layer or OCR'd, see DataBaseModel
+    page_sources: Optional[Dict[str, List[int]]] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     fetched: bool = False
 
 
@@ -28,14 +31,27 @@ class ExtractorConfig(BaseModel):
     languages: list[str] = ["fr"]
     strategy: Strategy = Strategy.AUTO
     no_cache: bool = True
+    no_text_layer: bool = False
     text_extractor: str = "unstructured"
     data_extractor: str = "llm"
     llm_model: str = "gemini-1.5-pro"
     llm_provider: str = "google-genai"
     llm_temperature: float = 0.1
+    chunk_size: Optional[int] = None
+    chunk_overlap: Optional[int] = None
+    chunk_concurrency: int = 4
+    no_llm_cache: bool = False
+    prune_context: bool = False
+    prune_top_k: int = 3
+    prune_token_budget: int = 4000
     examples: Optional[list[dict]] = None
     output_schema: Dict[str, Any]
 
+    @model_validator(mode="after")
+    def validate_chunking(self) -> "ExtractorConfig":
+        resolve_chunk_overlap(self.chunk_size, self.chunk_overlap)
+        return self
+
 
 class ExtractionRequest(BaseModel):
     config: ExtractorConfig